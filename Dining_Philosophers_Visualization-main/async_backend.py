@@ -0,0 +1,127 @@
+from threading import Thread
+import asyncio
+import resource
+import sys
+import time
+from simulation import Event, Simulation, State
+
+
+class AsyncSimulation(Simulation):
+    """Runs every philosopher as a coroutine of one event loop instead of an OS thread
+
+    The chopsticks are asyncio locks and the think, reach and eat times are asyncio.sleep calls.
+    A coroutine costs a few kilobytes where a thread reserves a whole stack, so one process runs
+    100k philosophers. The table, the observers and start/join/run are the ones of Simulation,
+    start() runs the event loop in a single background thread, stop() cancels every coroutine.
+    Observers are called from the event loop thread and must not block.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop = None
+        self.dining = None
+
+    def new_chopstick(self):
+        return asyncio.Lock()
+
+    async def pick_up(self, i, chopstick):
+        if self.chopsticks[chopstick].locked():
+            return False
+        # An unlocked asyncio lock is taken without giving control back to the loop
+        await self.chopsticks[chopstick].acquire()
+        return True
+
+    async def take(self, i, chopstick):
+        if not await self.pick_up(i, chopstick):
+            self.notify(Event.ACQUIRE_FAILED, i, chopstick)
+            return False
+        self.table.acquired(i, chopstick)
+        self.notify(Event.ACQUIRE, i, chopstick)
+        return True
+
+    async def acquire(self, i, left, right):
+        """Tries to take both chopsticks, returns False when philosopher i backed off"""
+        if not await self.take(i, left):
+            return False
+        await asyncio.sleep(self.reach_times[i]())
+        if await self.take(i, right):
+            return True
+        self.give_back(i, left)
+        return False
+
+    async def philosopher(self, i):
+        left = i
+        right = (i + 1) % self.number_of_philosophers
+        try:
+            while self.meals[i] > 0 and not self.stopping.is_set():
+                self.set_state(i, State.THINKING, Event.THINK)
+                await asyncio.sleep(self.think_times[i]())
+                self.set_state(i, State.HUNGRY, Event.HUNGRY)
+                if await self.acquire(i, left, right):
+                    self.set_state(i, State.EATING, Event.EAT)
+                    await asyncio.sleep(self.eat_times[i]())
+                    self.table.bite(i)
+                    self.notify(Event.BITE, i)
+                    self.release(i, left, right)
+        finally:
+            # stop() cancels the coroutine at an await, possibly while it holds chopsticks
+            for chopstick in (right, left):
+                if self.table.holders[chopstick] == i:
+                    self.give_back(i, chopstick)
+            self.set_state(i, State.THINKING, Event.FINISH)
+
+    async def dine(self):
+        self.loop = asyncio.get_running_loop()
+        self.dining = asyncio.gather(*(self.philosopher(i) for i in range(self.number_of_philosophers)))
+        try:
+            await self.dining
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        super().stop()
+        if self.dining is not None and not self.dining.done():
+            try:
+                self.loop.call_soon_threadsafe(self.dining.cancel)
+            except RuntimeError:
+                # The loop closed in the meantime, every philosopher is done
+                pass
+
+    def start(self, workers=None):
+        if workers:
+            raise ValueError("Coroutines run on a single event loop thread, a worker pool is not supported")
+        self.threads = [Thread(target=asyncio.run, args=(self.dine(),))]
+        self.threads[0].start()
+
+    def run(self, workers=None):
+        if workers:
+            raise ValueError("Coroutines run on a single event loop thread, a worker pool is not supported")
+        asyncio.run(self.dine())
+
+
+def main():
+    import argparse
+    from timing import Uniform, timings
+    parser = argparse.ArgumentParser(description="Runs a large table of coroutine philosophers")
+    parser.add_argument("-n", "--philosophers", type=int, default=100000)
+    parser.add_argument("-m", "--meals", type=int, default=3)
+    parser.add_argument("--sleep-scale", type=float, default=0.01,
+                        help="think, eat and reach times are uniform between 0 and the scale, in seconds")
+    arguments = parser.parse_args()
+    uniform = Uniform(0, arguments.sleep_scale)
+    # Small batches keep the three streams of every philosopher within a few hundred bytes
+    simulation = AsyncSimulation(arguments.philosophers, arguments.meals,
+                                 **timings(uniform, uniform, uniform, seed=0, batch_size=16))
+    started = time.monotonic()
+    simulation.run()
+    elapsed = time.monotonic() - started
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_kb = max_rss // 1024 if sys.platform == "darwin" else max_rss
+    meals = arguments.philosophers * arguments.meals
+    print(f"{arguments.philosophers} philosophers ate {meals} meals in {elapsed:.1f}s "
+          f"({meals / elapsed:.0f} meals/s), peak RSS {peak_rss_kb // 1024} MB")
+
+
+if __name__ == "__main__":
+    main()
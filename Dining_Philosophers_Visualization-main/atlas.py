@@ -0,0 +1,128 @@
+import json
+import os
+import pygame
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+ATLAS_IMAGE = "atlas.png"
+ATLAS_INDEX = "atlas.json"
+ATLAS_WIDTH = 1024
+PADDING = 1
+
+# Scale factors the visualizer asks for. Images that are not listed are only packed at scale 1.
+SCALES = {
+    "carpet.png": (12,),
+    "fireplace.png": (4,),
+    "music_player.png": (4,),
+    "sofa_front.png": (4,),
+    "sofa_single_right.png": (4,),
+    "stairs.png": (4,),
+    "desk.png": (3,),
+    "table_left.png": (4,),
+    "table_middle.png": (4,),
+    "table_right.png": (4,),
+    "round_table.png": (1, 4),
+    "chair_left_2.png": (4,),
+    "chair_right_2.png": (4,),
+    "chair_front_2.png": (4,),
+    "chair_back_2.png": (4,),
+    "characters.png": (4,),
+    "addition.png": (3,),
+    "subtraction.png": (3,),
+    "start.png": (0.2,),
+    "restart.png": (0.1,),
+    # Only used as scaled variants, the originals are too large to be worth packing.
+    "start_btn.png": (),
+    "kitchen.png": (),
+    "fork.png": (),
+    "meal.png": (),
+    "chopstick.png": (),
+}
+
+
+def variant_name(image_name, scale_factor=1):
+    return f"{image_name}@{scale_factor:g}"
+
+
+def build_atlas(assets_dir=ASSETS_DIR, width=ATLAS_WIDTH):
+    """Packs every png of the assets directory into one atlas image and writes its index
+    Parameters
+    ----------
+    assets_dir : str
+        The directory holding the pngs, the atlas is written next to them
+    width : int
+        Width of the atlas image
+    Returns
+    -------
+    sprites : dict
+        Variant name to (x, y, width, height) in the atlas
+    """
+    images = []
+    for image_name in sorted(os.listdir(assets_dir)):
+        if not image_name.endswith(".png") or image_name == ATLAS_IMAGE:
+            continue
+        image = pygame.image.load(os.path.join(assets_dir, image_name))
+        for scale_factor in SCALES.get(image_name, (1,)):
+            if scale_factor != 1:
+                scaled = pygame.transform.scale(
+                    image,
+                    (
+                        int(image.get_width() * scale_factor),
+                        int(image.get_height() * scale_factor)
+                    )
+                )
+            else:
+                scaled = image
+            images.append((variant_name(image_name, scale_factor), scaled))
+
+    # Shelf packing: tallest first, left to right, a new shelf when the row is full.
+    images.sort(key=lambda item: (-item[1].get_height(), item[0]))
+    sprites = {}
+    x = y = shelf_height = 0
+    for name, image in images:
+        w, h = image.get_size()
+        if w > width:
+            raise ValueError(f"{name} is wider than the atlas ({w} > {width})")
+        if x + w > width:
+            x = 0
+            y += shelf_height + PADDING
+            shelf_height = 0
+        sprites[name] = (x, y, w, h)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+
+    atlas = pygame.Surface((width, y + shelf_height), pygame.SRCALPHA)
+    for name, image in images:
+        atlas.blit(image, sprites[name][:2])
+    pygame.image.save(atlas, os.path.join(assets_dir, ATLAS_IMAGE))
+    with open(os.path.join(assets_dir, ATLAS_INDEX), "w") as index_file:
+        json.dump({"image": ATLAS_IMAGE, "sprites": sprites}, index_file, separators=(",", ":"))
+    return sprites
+
+
+class SpriteAtlas:
+    def __init__(self, assets_dir=ASSETS_DIR):
+        with open(os.path.join(assets_dir, ATLAS_INDEX)) as index_file:
+            index = json.load(index_file)
+        self.image = pygame.image.load(os.path.join(assets_dir, index["image"]))
+        if pygame.display.get_surface() is not None:
+            self.image = self.image.convert_alpha()
+        self.sprites = {name: pygame.Rect(rect) for name, rect in index["sprites"].items()}
+
+    @classmethod
+    def load(cls, assets_dir=ASSETS_DIR):
+        """Returns the atlas of the directory or None when it has not been built"""
+        if not os.path.exists(os.path.join(assets_dir, ATLAS_INDEX)):
+            return None
+        return cls(assets_dir)
+
+    def get(self, image_name, scale_factor=1):
+        """Returns a subsurface of the atlas for the image at the given scale, None if it is not packed"""
+        rect = self.sprites.get(variant_name(image_name, scale_factor))
+        if rect is None:
+            return None
+        return self.image.subsurface(rect)
+
+
+if __name__ == "__main__":
+    packed = build_atlas()
+    print(f"Packed {len(packed)} sprites into {os.path.join(ASSETS_DIR, ATLAS_IMAGE)}")
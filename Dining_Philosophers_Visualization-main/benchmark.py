@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from detector import Detector
+from strategies import STRATEGIES, Metrics, create, percentile
+from timing import Uniform, load_distributions, timings
+
+# Keys identifying a configuration in the results
+CONFIG_KEYS = ("backend", "philosophers", "meal_size", "sleep_scale", "seed", "timing_trace")
+# Metric name to the direction of a regression: 1 when higher is worse, -1 when lower is worse
+REGRESSION_METRICS = {
+    "meals_per_second": -1,
+    "mean_wait": 1,
+    "p99_wait": 1,
+    "cpu_time": 1,
+}
+
+
+def jain_index(values):
+    """Jain's fairness index, 1 when all values are equal and 1 / n when one value takes everything"""
+    total = sum(values)
+    squares = sum(value * value for value in values)
+    if squares == 0:
+        return 1.0
+    return total * total / (len(values) * squares)
+
+
+def run_configuration(backend, philosophers, meal_size, sleep_scale, seed, timing_trace=None, think_scale=None,
+                      eat_scale=None, reach_scale=None):
+    """Runs one configuration to completion and returns its measurements
+
+    Every configuration runs in its own process, so the CPU time and peak RSS are its own.
+    Think, eat and reach times are uniform between 0 and the sleep scale, or the scale given for
+    their step. With a timing_trace, the durations recorded in that trace replace the scales.
+    """
+    if timing_trace is None:
+        distributions = [Uniform(0, sleep_scale if scale is None else scale) for scale in (think_scale, eat_scale,
+                                                                                             reach_scale)]
+    else:
+        distributions = load_distributions(timing_trace)
+    simulation = create(backend, philosophers, meal_size, **timings(*distributions, seed))
+    result = dict(zip(CONFIG_KEYS, (backend, philosophers, meal_size, sleep_scale, seed, timing_trace)))
+    result.update(measure(simulation))
+    return result
+
+
+def measure(simulation):
+    """Runs the simulation to completion and returns its measurements
+
+    CPU time and peak RSS include the worker processes of a simulation that has some, the
+    children joined by run() are counted by RUSAGE_CHILDREN and report their own peak RSS.
+    """
+    philosophers = simulation.number_of_philosophers
+    metrics = Metrics(simulation)
+    detector = Detector(philosophers, on_deadlock=lambda cycle: None, on_livelock=lambda failures: None)
+    simulation.add_observer(detector)
+    cpu_started = time.process_time()
+    children_started = resource.getrusage(resource.RUSAGE_CHILDREN)
+    metrics.start()
+    simulation.run()
+    metrics.stop()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_time = (time.process_time() - cpu_started + children.ru_utime - children_started.ru_utime
+                + children.ru_stime - children_started.ru_stime)
+
+    result = metrics.report()
+    per_philosopher = [sorted(waits) for waits in metrics.waits]
+    result["wait_percentiles"] = [
+        {"p50": percentile(waits, 0.5), "p90": percentile(waits, 0.9), "p99": percentile(waits, 0.99)}
+        for waits in per_philosopher
+    ]
+    result["fairness"] = jain_index([sum(waits) for waits in per_philosopher])
+    result["elapsed"] = metrics.stopped - metrics.started
+    result.update(detector.report())
+    result["cpu_time"] = cpu_time
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    worker_peak_rss = getattr(simulation, "worker_peak_rss", None)
+    if worker_peak_rss is not None:
+        max_rss += worker_peak_rss()
+    result["peak_rss_kb"] = max_rss // 1024 if sys.platform == "darwin" else max_rss
+    return result
+
+
+def run_matrix(backends, philosopher_counts, meal_sizes, sleep_scales, seed=0, timing_trace=None):
+    """Runs every combination, one fresh process per configuration, and returns the results"""
+    if timing_trace is not None:
+        # The recorded durations take the place of the scales
+        sleep_scales = [None]
+    results = []
+    for configuration in product(backends, philosopher_counts, meal_sizes, sleep_scales):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_configuration, *configuration, seed, timing_trace).result()
+        scale = "recorded" if result["sleep_scale"] is None else f"{result['sleep_scale']:g}"
+        print(f"{result['backend']:<14}n={result['philosophers']:<5}m={result['meal_size']:<4}"
+              f"scale={scale:<8}{result['meals_per_second']:>10.1f} meals/s", file=sys.stderr)
+        results.append(result)
+    return results
+
+
+def write_results(results, path):
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w") as output:
+        json.dump(document, output, indent=1)
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """Returns the regressions of current against baseline larger than threshold, as readable lines"""
+    def by_configuration(document):
+        # Results written before a key existed have None for it
+        return {tuple(result.get(key) for key in CONFIG_KEYS): result for result in document["results"]}
+
+    baseline_results = by_configuration(baseline)
+    regressions = []
+    for configuration, result in by_configuration(current).items():
+        previous = baseline_results.get(configuration)
+        if previous is None:
+            continue
+        for metric, direction in REGRESSION_METRICS.items():
+            before, after = previous[metric], result[metric]
+            if before == 0:
+                continue
+            change = (after - before) / before
+            if change * direction > threshold:
+                name = ", ".join(f"{key}={value}" for key, value in zip(CONFIG_KEYS, configuration))
+                regressions.append(f"{name}: {metric} {before:.6g} -> {after:.6g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the dining philosophers backends")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run a benchmark matrix and write the results as json")
+    run.add_argument("-o", "--output", default="benchmark.json")
+    run.add_argument("--backends", nargs="+", default=["check_locked", "timeout"], choices=list(STRATEGIES))
+    run.add_argument("--philosophers", nargs="+", type=int, default=[5, 10])
+    run.add_argument("--meals", nargs="+", type=int, default=[5])
+    run.add_argument("--sleep-scales", nargs="+", type=float, default=[0.001, 0.01],
+                     help="think, eat and reach times are uniform between 0 and the scale, in seconds")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--timing-trace", default=None,
+                     help="replay the think, eat and reach times recorded in this trace instead of the scales")
+    compare = commands.add_parser("compare", help="flag the regressions between two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1, help="relative change, 0.1 is 10%%")
+    arguments = parser.parse_args()
+
+    if arguments.command == "run":
+        results = run_matrix(arguments.backends, arguments.philosophers, arguments.meals,
+                             arguments.sleep_scales, arguments.seed, arguments.timing_trace)
+        write_results(results, arguments.output)
+        return 0
+
+    with open(arguments.baseline) as baseline, open(arguments.current) as current:
+        regressions = compare_results(json.load(baseline), json.load(current), arguments.threshold)
+    for regression in regressions:
+        print(regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Seconds an import of the visualizer may take in a fresh interpreter
+IMPORT_BUDGET = 0.1
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter from another directory, prints what the import did as json
+_PROBE = """
+import json, logging, os, sys, time
+sys.path.insert(0, {base_dir!r})
+before = sorted(os.listdir({base_dir!r}))
+cwd = os.getcwd()
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "elapsed": elapsed,
+    "pygame": "pygame" in sys.modules,
+    "chdir": os.getcwd() != cwd,
+    "handlers": len(logging.getLogger().handlers) + len(logging.getLogger("dining_philosophers").handlers),
+    "new_files": sorted(set(os.listdir({base_dir!r})) - set(before) - {{"__pycache__"}}),
+}}))
+"""
+
+
+def probe(module):
+    """Imports module in a fresh interpreter and returns what the import did"""
+    # One import first so the byte code is compiled and the measure is the one of a warm start
+    for _ in range(2):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(base_dir=BASE_DIR, module=module)],
+                                cwd=os.path.dirname(BASE_DIR), capture_output=True, text=True, check=True).stdout
+    # pygame greets on stdout when it is imported, the result is the last line
+    return json.loads(output.splitlines()[-1])
+
+
+def check(module, budget=IMPORT_BUDGET):
+    """Returns the problems of the import of module, as readable lines"""
+    result = probe(module)
+    problems = []
+    if result["elapsed"] > budget:
+        problems.append(f"{module}: import took {result['elapsed'] * 1000:.1f}ms, budget {budget * 1000:.0f}ms")
+    if result["pygame"]:
+        problems.append(f"{module}: import loads pygame")
+    if result["chdir"]:
+        problems.append(f"{module}: import changes the working directory")
+    if result["handlers"]:
+        problems.append(f"{module}: import adds logging handlers")
+    if result["new_files"]:
+        problems.append(f"{module}: import creates {', '.join(result['new_files'])}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that importing the visualizer is fast and has no side effect")
+    parser.add_argument("modules", nargs="*", default=["dining_philosophers", "layout", "game"])
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="seconds")
+    arguments = parser.parse_args()
+    problems = [problem for module in arguments.modules for problem in check(module, arguments.budget)]
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
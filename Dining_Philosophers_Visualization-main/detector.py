@@ -0,0 +1,131 @@
+from array import array
+from threading import Lock
+import logging
+from simulation import Event
+from state import FREE
+
+logger = logging.getLogger(__name__)
+
+# Failed attempts in a row without a bite, per philosopher, before the table is reported as livelocked
+LIVELOCK_FAILURES = 50
+
+
+class Detector:
+    """Observer keeping the wait-for graph of the table to report deadlocks and livelocks as they happen
+
+    Each chopstick has at most one holder and each philosopher waits for at most one chopstick,
+    so the graph is a set of chains: a new edge closes a cycle only if following the chain from
+    the chopstick comes back to the waiting philosopher, which takes the length of the chain,
+    the length of the cycle when there is one. The edge is a wait or, since the events of two
+    threads can be heard of in either order, a hold on a chopstick somebody already waits for.
+    A chopstick lies between two philosophers, so it keeps the at most two philosophers waiting
+    on it and an ACQUIRE only walks from those.
+    Waits are the WAIT events of the strategies whose pick_up blocks, a philosopher stops
+    waiting on the ACQUIRE of that chopstick or its next ACQUIRE_FAILED.
+    The table is livelocked when failed attempts pile up without any bite in between.
+    """
+
+    def __init__(self, number_of_philosophers, livelock_failures=None, on_deadlock=None, on_livelock=None):
+        n = number_of_philosophers
+        self.holders = array('i', [FREE]) * n
+        self.waiting = array('i', [FREE]) * n
+        # Philosophers waiting on chopstick c, in slots 2 * c and 2 * c + 1
+        self.waiters = array('i', [FREE]) * (2 * n)
+        self.livelock_failures = livelock_failures or LIVELOCK_FAILURES * n
+        self.failures_since_bite = 0
+        self.livelocked = False
+        self.deadlocks = 0
+        self.livelocks = 0
+        self.longest_cycle = 0
+        self.on_deadlock = on_deadlock or self.log_deadlock
+        self.on_livelock = on_livelock or self.log_livelock
+        self.lock = Lock()
+
+    def __call__(self, event, philosopher, chopstick):
+        if event == Event.WAIT:
+            with self.lock:
+                self.wait(philosopher, chopstick)
+                cycle = self.closed_cycle(philosopher)
+            if cycle:
+                self.on_deadlock(cycle)
+        elif event == Event.ACQUIRE:
+            with self.lock:
+                # An acquire heard late must not end a wait on another chopstick heard first
+                if self.waiting[philosopher] == chopstick:
+                    self.wait(philosopher, FREE)
+                self.holders[chopstick] = philosopher
+                # The wait on this chopstick may have been heard of before the holder took it
+                cycle = None
+                for waiter in self.waiters[2 * chopstick:2 * chopstick + 2]:
+                    if waiter != FREE and waiter != philosopher:
+                        cycle = self.closed_cycle(waiter)
+                        if cycle:
+                            break
+            if cycle:
+                self.on_deadlock(cycle)
+        elif event == Event.RELEASE:
+            with self.lock:
+                # The next holder may have been heard of first
+                if self.holders[chopstick] == philosopher:
+                    self.holders[chopstick] = FREE
+        elif event == Event.ACQUIRE_FAILED:
+            if self.waiting[philosopher] != FREE:
+                with self.lock:
+                    self.wait(philosopher, FREE)
+            # Counted without a lock, a lost increment only delays the report
+            self.failures_since_bite += 1
+            if self.failures_since_bite >= self.livelock_failures and not self.livelocked:
+                self.livelocked = True
+                self.livelocks += 1
+                self.on_livelock(self.failures_since_bite)
+        elif event == Event.BITE:
+            self.failures_since_bite = 0
+            self.livelocked = False
+
+    def wait(self, philosopher, chopstick):
+        """Moves the wait of philosopher to chopstick, FREE for none, under the lock"""
+        previous = self.waiting[philosopher]
+        if previous != FREE:
+            for slot in (2 * previous, 2 * previous + 1):
+                if self.waiters[slot] == philosopher:
+                    self.waiters[slot] = FREE
+        self.waiting[philosopher] = chopstick
+        if chopstick != FREE:
+            # A third waiter, on a table wired otherwise, is only found by its own WAIT
+            slot = 2 * chopstick if self.waiters[2 * chopstick] == FREE else 2 * chopstick + 1
+            if self.waiters[slot] == FREE:
+                self.waiters[slot] = philosopher
+
+    def closed_cycle(self, philosopher):
+        """Counts and returns the wait cycle going through philosopher, or None, under the lock"""
+        cycle = self.cycle(philosopher)
+        if cycle:
+            self.deadlocks += 1
+            self.longest_cycle = max(self.longest_cycle, len(cycle))
+        return cycle
+
+    def cycle(self, philosopher):
+        """Philosophers of the wait cycle going through philosopher, or None"""
+        cycle = [philosopher]
+        holder = self.holders[self.waiting[philosopher]]
+        # A chain is at most as long as the table, which also guards against a stale edge
+        for _ in range(len(self.waiting)):
+            if holder == FREE:
+                return None
+            if holder == philosopher:
+                return cycle
+            cycle.append(holder)
+            chopstick = self.waiting[holder]
+            if chopstick == FREE:
+                return None
+            holder = self.holders[chopstick]
+        return None
+
+    def log_deadlock(self, cycle):
+        logger.warning(f"Deadlock: philosophers {' -> '.join(map(str, cycle))} wait for each other")
+
+    def log_livelock(self, failures):
+        logger.warning(f"Livelock: {failures} failed attempts without a bite")
+
+    def report(self):
+        return {"deadlocks": self.deadlocks, "livelocks": self.livelocks, "longest_cycle": self.longest_cycle}
@@ -1,296 +1,28 @@
 from __future__ import annotations
 import os
 import sys
-import threading
-import pygame
-from enum import Enum, auto
-import logging
-import random
-import time
+from game import FRAME_RATE, LONG_TABLE_LIMIT, ButtonState, PhiloshoperNumber, logger
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s:%(name)s:%(levelname)s:%(message)s')
-file_handler = logging.FileHandler('dining_philosophers.log')
-file_handler.setFormatter(formatter)
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+# Importing this module does no I/O and does not import pygame: the sprites live in the sprites
+# module, imported on first use of one of these names or when the game starts.
+SPRITE_NAMES = (
+    "load_image", "BackgroundFurniture", "TableFurniture", "Chair", "Meal", "Character", "Text", "StatsOverlay",
+    "Chopstick", "STATE_CHANGED", "ChangeNotifier", "SpriteObserver", "PhilosopherAddition", "StartGameButton",
+)
 
 
-MULTIPLIER = 4
-LEG = 6 * MULTIPLIER
-MID = 17 * MULTIPLIER
-XS = 240
-YS = 250
+def __getattr__(name):
+    if name in SPRITE_NAMES:
+        import sprites
+        return getattr(sprites, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-class ButtonState(Enum):
-    START = auto()
-    RESTART = auto()
-    ADDITION = auto()
-    SUBTRACTION = auto()
 
-# Fixes the File not found error when running from the command line.
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
-
-class BackgroundFurniture(pygame.sprite.Sprite):
-    def __init__(self, image_file, location, scale_factor=1.0, horizontal_flip=False, vertical_flip=False):
-        super().__init__()
-        self.image = pygame.image.load(image_file)
-        self.image = pygame.transform.flip(self.image, horizontal_flip, vertical_flip)
-        self.image = pygame.transform.scale(
-            self.image,
-            (
-                int(self.image.get_width() * scale_factor),
-                int(self.image.get_height() * scale_factor)
-            )
-        )
-        self.rect = self.image.get_rect(center=location)
-
-class TableFurniture(pygame.sprite.Sprite):
-    def __init__(self, image_file, location, scale_factor=1.0, horizontal_flip=False, vertical_flip=False):
-        super().__init__()
-        self.image = pygame.image.load(image_file)
-        self.image = pygame.transform.flip(self.image, horizontal_flip, vertical_flip)
-        self.image = pygame.transform.scale(
-            self.image,
-            (
-                int(self.image.get_width() * scale_factor),
-                int(self.image.get_height() * scale_factor)
-            )
-        )
-        self.rect = self.image.get_rect(x=location[0], y=location[1])
-
-
-class Chair(pygame.sprite.Sprite):
-    def __init__(self, image_file, location):
-        super().__init__()
-        self.image = pygame.image.load(image_file)
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*4, self.image.get_height()*4))
-        self.rect = self.image.get_rect(x=location[0], y=location[1])
-
-
-class Meal(pygame.sprite.Sprite):
-    def __init__(self, location=(0, 0)):
-        super().__init__()
-        self.image = pygame.image.load("assets/spaghetti_full.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*1, self.image.get_height()*1))
-        self.rect = self.image.get_rect(center=location)
-        self.left_to_eat = 10
-
-    def take_a_bite(self):
-        time.sleep(random.random())
-        self.left_to_eat -= 1
-        if self.left_to_eat == 0:
-            self.empty()
-
-    def empty(self):
-        self.image = pygame.image.load("assets/spaghetti_empty.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*1, self.image.get_height()*1))
-        self.rect = self.image.get_rect(center=self.rect.center)
-
-    def is_finished(self):
-        return self.left_to_eat == 0
-
-    def reset(self):
-        self.left_to_eat = 10
-        self.image = pygame.image.load("assets/spaghetti_full.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*1, self.image.get_height()*1))
-        self.rect = self.image.get_rect(center=self.rect.center)
-
-    def _set_coordinates(self, coordinates):
-        self.rect.x = coordinates[0]
-        self.rect.y = coordinates[1]
-
-class Character(pygame.sprite.Sprite):
-    def __init__(self, character_id, state_id,  location, chopstick_1: Chopstick, chopstick_2: Chopstick):
-        super().__init__()
-        self.image = pygame.image.load("assets/characters.png")
-        self.rect = self.image.get_rect(x=location[0], y = location[1])
-        self.image = self.image.subsurface(pygame.Rect(abs(state_id)*16, character_id*16, 16, 16))
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*4, self.image.get_height()*4))
-        if state_id < 0:
-            self.image = pygame.transform.flip(self.image, True, False)
-        self.direction = "right"
-        self.moving = False
-        self.speed = 5
-
-        self.meal = Meal()
-        self.chopstick_1 = chopstick_1
-        self.chopstick_2 = chopstick_2
-
-    def think(self):
-        time.sleep(random.randint(1, 10))
-
-    def eat(self):
-        if self.chopstick_1.locked():
-            return
-        self.chopstick_1.acquire()
-        time.sleep(random.random())
-        if not self.chopstick_2.locked():
-            self.chopstick_2.acquire()
-            time.sleep(random.random())
-            self.meal.take_a_bite()
-            self.chopstick_1.release()
-            self.chopstick_2.release()
-        else:
-            self.chopstick_1.release()
-
-    def get_meal(self):
-        return self.meal
-
-    def start_process(self):
-        while True:
-            self.eat()
-            self.think()
-            if self.meal.is_finished():
-                break
-
-    def stop_process(self):
-        self.meal.reset()
-
-class Text:
-    def __init__(self, text, location, font_size=20, font_color=(0, 0, 0)):
-        self.text = text
-        self.font = pygame.font.Font("assets/PressStart2P.ttf", font_size)
-        self.text_surface = self.font.render(self.text, True, font_color)
-        self.text_rect = self.text_surface.get_rect(center=location)
-
-
-class Chopstick(pygame.sprite.Sprite):
-    def __init__(self, angle, location=(0, 0), image_name="assets/chopstick_up.png"):
-        super().__init__()
-        self.sprites = {'free':pygame.image.load(image_name),
-                        'occupied': pygame.image.load("assets/empty.png")}
-        self.image = self.sprites['free']
-        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
-        # self.image = pygame.transform.rotate(self.image, angle)
-        self.angle = angle
-        self.rect = self.image.get_rect(center=location)
-        self.lock = threading.Lock()
-
-    def locked(self):
-        return self.lock.locked()
-
-    def acquire(self):
-        self.lock.acquire()
-        self.image = self.sprites['occupied']
-        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
-        # self.image = pygame.transform.rotate(self.image, self.angle)
-
-    def release(self):
-        self.lock.release()
-        self.image = self.sprites['free']
-        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
-        # self.image = pygame.transform.rotate(self.image, self.angle)
-
-class PhilosopherAddition(pygame.sprite.Sprite):
-    def __init__(self, location: tuple, type: ButtonState, number: PhiloshoperNumber):
-        super().__init__()
-        self.type = type
-        assert type in [ButtonState.ADDITION, ButtonState.SUBTRACTION]
-        if type == ButtonState.ADDITION:
-            self.image = pygame.image.load("assets/addition.png")
-        elif type == ButtonState.SUBTRACTION:
-            self.image = pygame.image.load("assets/subtraction.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width()*3, self.image.get_height()*3))
-        self.rect = self.image.get_rect(center=location)
-        self.number = number
-
-    def change_number(self):
-        logger.info(f"{self.type} button pressed")
-        if self.type == ButtonState.ADDITION:
-            self.number.change_number(1)
-        elif self.type == ButtonState.SUBTRACTION:
-            self.number.change_number(-1)
-
-
-class PhiloshoperNumber():
-    def __init__(self, starting_number=None):
-        self.MIN_LIMIT = 2
-        self.MAX_LIMIT = 10
-        if starting_number is None:
-            self.number = random.randint(self.MIN_LIMIT, self.MAX_LIMIT)
-        else:
-            self.number = starting_number
-        self.lock = False
-
-    def change_number(self, change):
-        if self.lock:
-            return
-        if self.number + change < self.MIN_LIMIT:
-            self.number = self.MIN_LIMIT
-        elif self.number + change > self.MAX_LIMIT:
-            self.number = self.MAX_LIMIT
-        else:
-            self.number += change
-        logger.info(f"Number of philosophers: {self.number}")
-
-    def get_number(self):
-        return self.number
-
-    def lock_number(self):
-        self.lock = True
-
-    def unlock_number(self):
-        self.lock = False
-
-    def __str__(self) -> str:
-        return str(self.number)
-
-    def __repr__(self) -> str:
-        return self.__str__()
-
-
-class StartGameButton(pygame.sprite.Sprite):
-    def __init__(self, location: tuple):
-        super().__init__()
-        self.image = pygame.image.load("assets/start.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width() * 0.2, self.image.get_height() * 0.2))
-        self.rect = self.image.get_rect(center=location)
-        self.game_state = ButtonState.START
-        self.philosophers = []
-        self.philosophers_threads = []
-
-    def start_game(self, philosophers: list):
-        if self.game_state == ButtonState.START:
-            logger.info("Start game button pressed")
-            self.game_state = ButtonState.RESTART
-            self.image = pygame.image.load("assets/restart.png")
-            self.image = pygame.transform.scale(self.image, (self.image.get_width() * 0.1, self.image.get_height() * 0.1))
-            self.philosophers = philosophers
-
-            for philosopher in self.philosophers:
-                thread = threading.Thread(target=philosopher.start_process)
-                self.philosophers_threads.append(thread)
-
-            for thread in self.philosophers_threads:
-                thread.start()
-
-    def restart_game(self):
-        if self.game_state != ButtonState.RESTART:
-            return
-        logger.info("Restart game button pressed")
-        self.game_state = ButtonState.START
-        self.image = pygame.image.load("assets/start.png")
-        self.image = pygame.transform.scale(self.image, (self.image.get_width() * 0.2, self.image.get_height() * 0.2))
-        if len(self.philosophers_threads) > 0:
-            for philosopher_thread in self.philosophers_threads:
-                # Kill thread
-                # philosopher_thread._stop()
-                philosopher_thread.join(0.01)
-            self.philosophers_threads = []
-            self.philosophers = []
-        else:
-            logger.error("No philosophers to restart")
-
-    def get_game_state(self):
-        return self.game_state
-
-
-def main():
+def main(replay_seed=None, speed=1.0, trace_path=None, record_path=None, log_sample=None, timing_path=None):
+    import pygame
+    from layout import MULTIPLIER, table_layout
+    from sprites import (STATE_CHANGED, BackgroundFurniture, ChangeNotifier, Chair, Character, Chopstick,
+                         PhilosopherAddition, StartGameButton, StatsOverlay, TableFurniture, Text)
     WIDTH = 800
     HEIGHT = 600
     pygame.init()
@@ -298,6 +30,9 @@ def main():
     pygame.display.set_caption("Dining Philosophers")
     screen.fill((255, 255, 255))
     clock = pygame.time.Clock()
+    # Moving the mouse changes nothing on the screen, it must not wake the loop up
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+    notifier = ChangeNotifier()
 
     background_group = pygame.sprite.Group()
     floors = [ BackgroundFurniture("assets/floor.png", (x, y)) for x in range(0, WIDTH+100, 62) for y in range(0, HEIGHT+100, 46)]
@@ -316,471 +51,119 @@ def main():
     ### TABLE ###
     title_text = Text("Dining Philosophers", (WIDTH//2 - 100, HEIGHT - 50), 24, (200, 255, 200))
 
-    philosopher_number = PhiloshoperNumber(starting_number=5)
+    start_game_button = StartGameButton((WIDTH - 250, HEIGHT - 60), replay_seed, speed, trace_path, record_path,
+                                        log_sample, notifier, timing_path)
+    # A trace is replayed on the table it was recorded on
+    trace = start_game_button.trace
+    philosopher_number = PhiloshoperNumber(starting_number=5 if trace is None else trace.number_of_philosophers)
+    if trace is not None:
+        philosopher_number.lock_number()
     addition = PhilosopherAddition((0 + 145, HEIGHT - 60), ButtonState.ADDITION, philosopher_number)
     subtraction = PhilosopherAddition((0 + 60, HEIGHT - 60), ButtonState.SUBTRACTION, philosopher_number)
-    addition_group = pygame.sprite.Group()
-    addition_group.add(addition, subtraction)
 
-    start_game_button = StartGameButton((WIDTH - 250, HEIGHT - 60))
-    game_state_group = pygame.sprite.Group()
-    game_state_group.add(start_game_button)
+    # Everything that can change is drawn as a dirty sprite over the static layer,
+    # only the rectangles that changed are pushed to the display.
+    CHOPSTICK_LAYER, MEAL_LAYER, PHILOSOPHER_LAYER, BUTTON_LAYER = range(4)
+    dynamic_group = pygame.sprite.LayeredDirty()
+    dynamic_group.add(addition, subtraction, start_game_button, layer=BUTTON_LAYER)
+    stats_overlay = StatsOverlay((10, 10))
+    dynamic_group.add(stats_overlay, layer=BUTTON_LAYER)
 
     number_lock = False
 
 
-    def create_table(philosopher_number: int) -> pygame.sprite.Group:
-        table_group = pygame.sprite.Group()
-        table_left = TableFurniture("assets/table_left.png", (XS, YS), MULTIPLIER)
-
-        added_middle_count = 0
-
-        if philosopher_number < 2 or philosopher_number > 10:
-            raise ValueError("Number of philosophers must be between 2 and 10")
-
-        if philosopher_number <= 4:
-            table_middle_0 = TableFurniture("assets/table_middle.png", (XS + LEG, YS), MULTIPLIER)
-            added_middle_count = 1
-            table_group.add(table_middle_0)
-
-        elif philosopher_number > 4 and philosopher_number <= 6:
-            table_middle_0 = TableFurniture("assets/table_middle.png", (XS + LEG, YS), MULTIPLIER)
-            table_middle_1 = TableFurniture("assets/table_middle.png", (XS + MID + LEG, YS), MULTIPLIER)
-            added_middle_count = 2
-            table_group.add(table_middle_0, table_middle_1)
-
-        elif philosopher_number > 6 and philosopher_number <= 8:
-            table_middle_0 = TableFurniture("assets/table_middle.png", (XS + LEG, YS), MULTIPLIER)
-            table_middle_1 = TableFurniture("assets/table_middle.png", (XS + MID + LEG, YS), MULTIPLIER)
-            table_middle_2 = TableFurniture("assets/table_middle.png", (XS + (MID * 2) + LEG, YS), MULTIPLIER)
-            added_middle_count = 3
-            table_group.add(table_middle_0, table_middle_1, table_middle_2)
-
-        else:
-            table_middle_0 = TableFurniture("assets/table_middle.png", (XS + LEG, YS), MULTIPLIER)
-            table_middle_1 = TableFurniture("assets/table_middle.png", (XS + MID + LEG, YS), MULTIPLIER)
-            table_middle_2 = TableFurniture("assets/table_middle.png", (XS + (MID * 2) + LEG, YS), MULTIPLIER)
-            table_middle_3 = TableFurniture("assets/table_middle.png", (XS + (MID * 3) + LEG, YS), MULTIPLIER)
-            added_middle_count = 4
-
-            table_group.add(table_middle_0, table_middle_1, table_middle_2, table_middle_3)
-
-
-        table_right = TableFurniture("assets/table_right.png", (XS + (MID * added_middle_count) + LEG, YS), MULTIPLIER)
-        table_group.add(table_left, table_right)
-        return table_group
-
-
     def load_position(number):
-        """Loads a pre-defined position for the philosophers, chairs, meals and chopsticks based on the number of philosophers
+        """Loads the position for the philosophers, chairs, meals and chopsticks computed by the layout engine
         Parameters
         ----------
         number : int
             The number of philosophers
         Returns
         -------
-        meal_group : pygame.sprite.Group
-            The group of meals
-        philosopher_group : pygame.sprite.Group
-            The group of philosophers
+        meals : list
+            The meals of the philosophers
+        philosophers : list
+            The philosophers
+        chopsticks : list
+            The chopsticks
+        table_group : pygame.sprite.Group
+            The table and the chairs, they do not change until the next call
         """
-        if number == 2:
-            chopstick_0 = Chopstick(225, (284,300), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (313, 268),image_name='assets/chopstick_45.png' ) 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (350,260)) 
-
-            philosopher_0 = Character(5, 2, (197,255), chopstick_0, chopstick_1) 
-            philosopher_1 = Character(14, -2, (345,260), chopstick_1, chopstick_0) 
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((315,270))
-
-            chopsticks = [chopstick_0, chopstick_1]
-            chairs = [chair_0, chair_1]
-
-
-            philosophers = [philosopher_0, philosopher_1]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 3:
-            chopstick_0 = Chopstick(225, (284,300), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (300, 266),image_name='assets/chopstick_up.png' ) 
-            chopstick_2 = Chopstick(15, (315,300), image_name='assets/chopstick_45r.png') 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (350,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_1) 
-            philosopher_1 = Character(14, -2, (350,260), chopstick_1, chopstick_2) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((315,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2]
-            chairs = [chair_0, chair_1, chair_2]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-
-        elif number == 4:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (325, 270),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (325,310), image_name='assets/chopstick_45r.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
+        layout = table_layout(number, "long" if number <= LONG_TABLE_LIMIT else "round")
+        scale_factor = layout.scale_factor
 
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (350,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (350,260), chopstick_1, chopstick_2) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_1) 
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((315,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3]
-            chairs = [chair_0, chair_1, chair_2, chair_3]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-            
-        elif number == 5:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (380,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (370,310), image_name='assets/chopstick_45r.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (325, 270), image_name='assets/chopstick_up.png') 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (420,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (300,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (415,260), chopstick_1, chopstick_2) 
-            philosopher_2 = Character(11, 1, (300,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4) 
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_1) 
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((380,270))
-            philosopher_2.get_meal()._set_coordinates((320,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((340,255))
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 6:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (380,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (325,310), image_name='assets/chopstick_up.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (325, 270), image_name='assets/chopstick_up.png') 
-            chopstick_5 = Chopstick(15, (390,310), image_name='assets/chopstick_45r.png') 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (420,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344))  
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-            chair_5 = Chair("assets/chair_back_2.png", (350,344)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (415,260), chopstick_1, chopstick_5) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4) 
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_1) 
-            philosopher_5 = Character(12, 1, (350,320), chopstick_5, chopstick_2) 
-
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((380,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((340,255))
-            philosopher_5.get_meal()._set_coordinates((340,290))
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4,chopstick_5]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4, chair_5]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4,philosopher_5]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 7:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (460,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (350,310), image_name='assets/chopstick_up.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (350, 270), image_name='assets/chopstick_up.png') 
-            chopstick_5 = Chopstick(15, (420,310), image_name='assets/chopstick_up.png') 
-            chopstick_6 = Chopstick(15, (420,270), image_name='assets/chopstick_UP.png') 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (490,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-            chair_5 = Chair("assets/chair_back_2.png", (350,344)) 
-            chair_6 = Chair("assets/chair_FRONT_2.png", (430,160)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (480,260), chopstick_1, chopstick_5) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4) 
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_6) 
-            philosopher_5 = Character(12, 1, (350,320), chopstick_5, chopstick_2) 
-            philosopher_6 = Character(1, 4, (420,170), chopstick_6, chopstick_1)  
-
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((455,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((370,255))
-            philosopher_5.get_meal()._set_coordinates((370,290))
-            philosopher_6.get_meal()._set_coordinates((420,255))
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4,chopstick_5, chopstick_6]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4, chair_5, chair_6]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4,philosopher_5,philosopher_6]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 8:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (460,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (350,310), image_name='assets/chopstick_up.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (350, 270), image_name='assets/chopstick_up.png') 
-            chopstick_5 = Chopstick(15, (420,310), image_name='assets/chopstick_up.png') 
-            chopstick_6 = Chopstick(15, (420,270), image_name='assets/chopstick_UP.png') 
-            chopstick_7 = Chopstick(160, (460,310),image_name='assets/chopstick_45r.png' ) 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (490,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-            chair_5 = Chair("assets/chair_back_2.png", (350,344)) 
-            chair_6 = Chair("assets/chair_FRONT_2.png", (430,160)) 
-            chair_7 = Chair("assets/chair_back_2.png", (430,344)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (480,260), chopstick_1, chopstick_7) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4) 
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_6) 
-            philosopher_5 = Character(12, 1, (350,320), chopstick_5, chopstick_2) 
-            philosopher_6 = Character(1, 4, (420,170), chopstick_6, chopstick_1) 
-            philosopher_7 = Character(6, 1, (420,320), chopstick_7, chopstick_5) 
-
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((455,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((370,255))
-            philosopher_5.get_meal()._set_coordinates((370,290))
-            philosopher_6.get_meal()._set_coordinates((420,255))
-            philosopher_7.get_meal()._set_coordinates((420,290))
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4,chopstick_5, chopstick_6, chopstick_7 ]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4, chair_5, chair_6, chair_7]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4,philosopher_5,philosopher_6,philosopher_7]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 9:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (525,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (350,310), image_name='assets/chopstick_up.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (350, 270), image_name='assets/chopstick_up.png') 
-            chopstick_5 = Chopstick(15, (420,310), image_name='assets/chopstick_up.png') 
-            chopstick_6 = Chopstick(15, (420,270), image_name='assets/chopstick_UP.png') 
-            chopstick_7 = Chopstick(160, (460,310),image_name='assets/chopstick_up.png' ) 
-            chopstick_8 = Chopstick(160, (460,270),image_name='assets/chopstick_up.png' ) 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (560,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-            chair_5 = Chair("assets/chair_back_2.png", (350,344)) 
-            chair_6 = Chair("assets/chair_FRONT_2.png", (430,160)) 
-            chair_7 = Chair("assets/chair_back_2.png", (430,344)) 
-            chair_8 = Chair("assets/chair_front_2.png", (500,160)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (560,260), chopstick_1, chopstick_7) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4) 
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_6) 
-            philosopher_5 = Character(12, 1, (350,320), chopstick_5, chopstick_2)  
-            philosopher_6 = Character(1, 4, (420,170), chopstick_6, chopstick_8) 
-            philosopher_7 = Character(6, 1, (420,320), chopstick_7, chopstick_5) 
-            philosopher_8 = Character(8, 4, (500,170), chopstick_8, chopstick_1) 
-
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((520,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((370,255))
-            philosopher_5.get_meal()._set_coordinates((370,290))
-            philosopher_6.get_meal()._set_coordinates((420,255))
-            philosopher_7.get_meal()._set_coordinates((420,290))
-            philosopher_8.get_meal()._set_coordinates((480,255))
-
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4,chopstick_5, chopstick_6, chopstick_7,chopstick_8 ]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4, chair_5, chair_6, chair_7, chair_8]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4,philosopher_5,philosopher_6,philosopher_7, philosopher_8]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        elif number == 10:
-            chopstick_0 = Chopstick(225, (280,305), image_name='assets/chopstick_45.png') 
-            chopstick_1 = Chopstick(160, (525,275),image_name='assets/chopstick_45.png' ) 
-            chopstick_2 = Chopstick(15, (350,310), image_name='assets/chopstick_up.png') 
-            chopstick_3 = Chopstick(15, (270,270), image_name='assets/chopstick_45r.png') 
-            chopstick_4 = Chopstick(15, (350, 270), image_name='assets/chopstick_up.png') 
-            chopstick_5 = Chopstick(15, (420,310), image_name='assets/chopstick_up.png') 
-            chopstick_6 = Chopstick(15, (420,270), image_name='assets/chopstick_UP.png') 
-            chopstick_7 = Chopstick(160, (460,310),image_name='assets/chopstick_up.png' ) 
-            chopstick_8 = Chopstick(160, (460,270),image_name='assets/chopstick_up.png' ) 
-            chopstick_9 = Chopstick(160, (525,310),image_name='assets/chopstick_45r.png' ) 
-
-            chair_0 = Chair("assets/chair_left_2.png", (190,255)) 
-            chair_1 = Chair("assets/chair_right_2.png", (560,260)) 
-            chair_2 = Chair("assets/chair_back_2.png", (270,344)) 
-            chair_3 = Chair("assets/chair_front_2.png", (270,160)) 
-            chair_4 = Chair("assets/chair_front_2.png", (350,160)) 
-            chair_5 = Chair("assets/chair_back_2.png", (350,344)) 
-            chair_6 = Chair("assets/chair_FRONT_2.png", (430,160)) 
-            chair_7 = Chair("assets/chair_back_2.png", (430,344)) 
-            chair_8 = Chair("assets/chair_front_2.png", (500,160)) 
-            chair_9 = Chair("assets/chair_back_2.png", (500,344)) 
-
-            philosopher_0 = Character(5, 2, (190,255), chopstick_0, chopstick_3) 
-            philosopher_1 = Character(14, -2, (560,260), chopstick_1, chopstick_9) 
-            philosopher_2 = Character(11, 1, (270,320), chopstick_2, chopstick_0 )
-            philosopher_3 = Character(15, 4, (270,170), chopstick_3, chopstick_4)   
-            philosopher_4 = Character(3, 4, (350,170), chopstick_4, chopstick_6)   
-            philosopher_5 = Character(12, 1, (350,320), chopstick_5, chopstick_2)  
-            philosopher_6 = Character(1, 4, (420,170), chopstick_6, chopstick_8) 
-            philosopher_7 = Character(6, 1, (420,320), chopstick_7, chopstick_5) 
-            philosopher_8 = Character(8, 4, (500,170), chopstick_8, chopstick_1)  
-            philosopher_9 = Character(7, 1, (500,320), chopstick_9, chopstick_7) 
-
-
-
-            philosopher_0.get_meal()._set_coordinates((250,270))
-            philosopher_1.get_meal()._set_coordinates((520,270))
-            philosopher_2.get_meal()._set_coordinates((285,290))
-            philosopher_3.get_meal()._set_coordinates((285,255))
-            philosopher_4.get_meal()._set_coordinates((370,255))
-            philosopher_5.get_meal()._set_coordinates((370,290))
-            philosopher_6.get_meal()._set_coordinates((420,255))
-            philosopher_7.get_meal()._set_coordinates((420,290))
-            philosopher_8.get_meal()._set_coordinates((480,255))
-            philosopher_9.get_meal()._set_coordinates((480,290))
-
-
-
-            chopsticks = [chopstick_0, chopstick_1, chopstick_2, chopstick_3, chopstick_4,chopstick_5, chopstick_6, chopstick_7,chopstick_8,chopstick_9 ]
-            chairs = [chair_0, chair_1, chair_2, chair_3, chair_4, chair_5, chair_6, chair_7, chair_8, chair_9]
-
-
-            philosophers = [philosopher_0, philosopher_1, philosopher_2, philosopher_3, philosopher_4,philosopher_5,philosopher_6,philosopher_7, philosopher_8,philosopher_9]
-            meals = [p.get_meal() for p in philosophers]
-            table_group = create_table(number)
-            table_group.add(chairs)
-            table_group.add(chopsticks)
-
-            return meals, philosophers, table_group
-        else:
-            raise Exception("Number of philosophers must be between 2 and 10")
+        table_group = pygame.sprite.Group()
+        for furniture in layout.table:
+            table_group.add(TableFurniture(furniture.image, furniture.location, furniture.scale_factor))
+
+        chopsticks = [
+            Chopstick(placement.angle, placement.location, image_name=placement.image,
+                      scale_factor=scale_factor / MULTIPLIER)
+            for placement in layout.chopsticks
+        ]
+        chairs = [Chair(seat.chair_image, seat.chair_location, scale_factor) for seat in layout.seats]
+        philosophers = []
+        for i, seat in enumerate(layout.seats):
+            philosopher = Character(seat.character_id, seat.state_id, seat.character_location,
+                                    chopsticks[i], chopsticks[(i + 1) % number], scale_factor)
+            philosopher.get_meal()._set_coordinates(seat.meal_location)
+            philosophers.append(philosopher)
+
+        meals = [p.get_meal() for p in philosophers]
+        table_group.add(chairs)
+
+        return meals, philosophers, chopsticks, table_group
+
+    # The background never changes, it is composited once.
+    background_layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+    background_group.draw(background_layer)
+    background_layer.blit(title_text.text_surface, title_text.text_rect)
+
+    def create_static_layer(table_group: pygame.sprite.Group) -> pygame.Surface:
+        """Composites the background and the table, must be called again when the table changes"""
+        static_layer = background_layer.copy()
+        table_group.draw(static_layer)
+        return static_layer
+
+    def show_position(number):
+        """Replaces the table, chairs and sprites with the position of the given number of philosophers"""
+        meals, philosophers, chopsticks, table_group = load_position(number)
+        static_layer = create_static_layer(table_group)
+        for layer in (CHOPSTICK_LAYER, MEAL_LAYER, PHILOSOPHER_LAYER):
+            dynamic_group.remove_sprites_of_layer(layer)
+        dynamic_group.add(chopsticks, layer=CHOPSTICK_LAYER)
+        dynamic_group.add(meals, layer=MEAL_LAYER)
+        dynamic_group.add(philosophers, layer=PHILOSOPHER_LAYER)
+        dynamic_group.clear(screen, static_layer)
+        screen.blit(static_layer, (0, 0))
+        dynamic_group.repaint_rect(screen.get_rect())
+        return philosophers
 
     # Load the default position
-    meals, philosophers, table_group = load_position(5)
+    philosophers = show_position(philosopher_number.get_number())
     while True:
-        for event in pygame.event.get():
+        # Sleeps until an input, a change posted by the simulation or the time to refresh the stats
+        due_in = stats_overlay.due_in(start_game_button.instrumentation)
+        events = [pygame.event.wait(0 if due_in is None else max(1, due_in))]
+        notifier.taken()
+        events.extend(pygame.event.get())
+        for event in events:
+            if event.type == STATE_CHANGED:
+                stats_overlay.stale = True
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             # If the mouse is clicked on the addition sprite, add a new philosopher
             if event.type == pygame.MOUSEBUTTONDOWN:
-                print(pygame.mouse.get_pos())
+                logger.debug(f"Click at {event.pos}")
                 if number_lock == False:
                     if addition.rect.collidepoint(event.pos):
                         addition.change_number()
-                        meals, philosophers, table_group = load_position(addition.number.get_number())
+                        philosophers = show_position(addition.number.get_number())
                     if subtraction.rect.collidepoint(event.pos):
                         subtraction.change_number()
                         logger.debug(f"Trying to load position {subtraction.number.get_number()}")
-                        meals, philosophers, table_group = load_position(subtraction.number.get_number())
+                        philosophers = show_position(subtraction.number.get_number())
                 if start_game_button.rect.collidepoint(event.pos):
                     if start_game_button.get_game_state() == ButtonState.START:
                         start_game_button.start_game(philosophers=philosophers)
@@ -788,36 +171,47 @@ def main():
                     elif start_game_button.get_game_state() == ButtonState.RESTART:
                         start_game_button.restart_game()
                         number_lock = False
-
-        # DRAWING ORDER: Background, Table, Title, Meals, Philosophers, Buttons
-        # Background objects
-        background_group.draw(screen)
-
-        # Eating Table
-        table_group.draw(screen)
-
-        # Game title
-        screen.blit(title_text.text_surface, title_text.text_rect)
-
-        # Meals of the philosophers
-        meal_group = pygame.sprite.Group()
-        for meal in meals:
-            meal_group.add(meal)
-        meal_group.draw(screen)
-
-        # Philosophers
-        philosopher_group = pygame.sprite.Group()
-        for philosopher in philosophers:
-            philosopher_group.add(philosopher)
-        philosopher_group.draw(screen)
-
-        # Game Control Buttons
-        addition_group.draw(screen)
-        game_state_group.draw(screen)
-
-        # Game Clock
-        pygame.display.update()
-        clock.tick(60)
+            # Left and right scrub through a trace replay, up and down change its speed
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    start_game_button.scrub(-1)
+                elif event.key == pygame.K_RIGHT:
+                    start_game_button.scrub(1)
+                elif event.key == pygame.K_UP:
+                    start_game_button.change_speed(2)
+                elif event.key == pygame.K_DOWN:
+                    start_game_button.change_speed(0.5)
+
+        # DRAWING ORDER: Static layer (background, table, title), Chopsticks, Meals, Philosophers, Buttons
+        # Only the sprites marked as dirty are redrawn, over the static layer
+        stats_overlay.refresh(start_game_button.instrumentation)
+        dirty_rects = dynamic_group.draw(screen)
+
+        # Game Clock, a burst of changes is drawn at FRAME_RATE at most
+        pygame.display.update(dirty_rects)
+        clock.tick(FRAME_RATE)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Dining Philosophers")
+    parser.add_argument("--replay-seed", type=int, default=None,
+                        help="run a discrete-event simulation with this seed and replay it")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 10 plays ten times faster")
+    parser.add_argument("--trace", default=None,
+                        help="replay a binary trace, left and right scrub through it, up and down change the speed")
+    parser.add_argument("--record", default=None,
+                        help="write the binary trace of the first game to this file, the next ones end in -2, -3...")
+    parser.add_argument("--timing-trace", default=None,
+                        help="think, eat and reach for as long as the philosophers of this trace did")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-json", action="store_true", help="write the log as one json object per line")
+    parser.add_argument("--log-events", type=int, default=None, metavar="N",
+                        help="log one simulation event out of N, at DEBUG level whatever --log-level")
+    arguments = parser.parse_args()
+    if arguments.log_events is not None and arguments.log_events < 1:
+        parser.error("--log-events must be at least 1")
+    from logs import configure
+    configure(os.path.join(os.path.dirname(os.path.abspath(__file__)), "dining_philosophers.log"),
+              arguments.log_level, arguments.log_json, events=arguments.log_events is not None)
+    main(arguments.replay_seed, arguments.speed, arguments.trace, arguments.record, arguments.log_events,
+         arguments.timing_trace)
@@ -0,0 +1,154 @@
+from itertools import count
+from threading import Event as Flag, Thread
+import heapq
+import random
+import time
+from simulation import Event, Simulation, State
+
+
+class DiscreteEventSimulation(Simulation):
+    """Runs the protocol of Simulation.philosopher on a virtual clock instead of threads
+
+    Every philosopher has exactly one pending step in a priority queue ordered by virtual time,
+    so a run does not wait for any sleep and is reproducible from its seed. Observers can read
+    the virtual time of the event they receive from self.now.
+    """
+
+    def __init__(self, number_of_philosophers, meal_size=9, think_time=None, eat_time=None, reach_time=None,
+                 seed=0):
+        self.random = random.Random(seed)
+        super().__init__(number_of_philosophers, meal_size,
+                         think_time or self.random.random,
+                         eat_time or self.random.random,
+                         reach_time or self.random.random)
+        self.now = 0.0
+        self.queue = []
+        self.sequence = count()
+
+    def new_chopstick(self):
+        # A chopstick is the philosopher holding it, or None
+        return None
+
+    def pick_up(self, i, chopstick):
+        if self.chopsticks[chopstick] is not None:
+            return False
+        self.chopsticks[chopstick] = i
+        return True
+
+    def put_down(self, i, chopstick):
+        self.chopsticks[chopstick] = None
+
+    def schedule(self, delay, step, i):
+        heapq.heappush(self.queue, (self.now + delay, next(self.sequence), step, i))
+
+    def think(self, i):
+        self.set_state(i, State.THINKING, Event.THINK)
+        self.schedule(self.think_times[i](), self.hungry, i)
+
+    def hungry(self, i):
+        self.set_state(i, State.HUNGRY, Event.HUNGRY)
+        if self.take(i, i):
+            self.schedule(self.reach_times[i](), self.reach, i)
+        else:
+            self.think(i)
+
+    def reach(self, i):
+        if self.take(i, (i + 1) % self.number_of_philosophers):
+            self.set_state(i, State.EATING, Event.EAT)
+            self.schedule(self.eat_times[i](), self.bite, i)
+        else:
+            self.give_back(i, i)
+            self.think(i)
+
+    def bite(self, i):
+        self.table.bite(i)
+        self.notify(Event.BITE, i)
+        self.give_back(i, (i + 1) % self.number_of_philosophers)
+        self.give_back(i, i)
+        if self.meals[i] > 0:
+            self.think(i)
+        else:
+            self.set_state(i, State.THINKING, Event.FINISH)
+
+    def start(self):
+        for i in range(self.number_of_philosophers):
+            if self.meals[i] > 0:
+                self.schedule(0.0, self.think, i)
+
+    def step(self, until=None):
+        """Processes the events up to the virtual time until, returns whether events are left"""
+        queue = self.queue
+        while queue and not self.stopping.is_set():
+            if until is not None and queue[0][0] > until:
+                self.now = until
+                return True
+            self.now, _, step, i = heapq.heappop(queue)
+            step(i)
+        return False
+
+    def join(self, timeout=None):
+        self.step()
+
+    def run(self):
+        self.start()
+        self.step()
+
+
+class Recorder:
+    """Observer keeping the (time, event, philosopher, chopstick) events of a DiscreteEventSimulation"""
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.events = []
+        simulation.add_observer(self)
+
+    def __call__(self, event, philosopher, chopstick):
+        self.events.append((self.simulation.now, event, philosopher, chopstick))
+
+
+class Replay:
+    """Plays recorded events back to observers in real time, speed times faster than the virtual clock
+
+    It has the start/join/stop/add_observer interface of Simulation so the front-ends can run either.
+    """
+
+    def __init__(self, events, speed=1.0):
+        self.events = events
+        self.speed = speed
+        self.observers = []
+        self.thread = None
+        self.stopping = Flag()
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def play(self):
+        started = time.monotonic()
+        for timestamp, event, philosopher, chopstick in self.events:
+            delay = started + timestamp / self.speed - time.monotonic()
+            if delay > 0 and self.stopping.wait(delay):
+                return
+            for observer in self.observers:
+                observer(event, philosopher, chopstick)
+
+    def start(self):
+        self.thread = Thread(target=self.play, daemon=True)
+        self.thread.start()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stop(self):
+        self.stopping.set()
+
+    def alive_threads(self):
+        return int(self.thread is not None and self.thread.is_alive())
+
+
+def record(number_of_philosophers, meal_size=9, seed=0, **timings):
+    """Runs a DiscreteEventSimulation and returns its recorded events"""
+    simulation = DiscreteEventSimulation(number_of_philosophers, meal_size, seed=seed, **timings)
+    recorder = Recorder(simulation)
+    simulation.run()
+    return recorder.events
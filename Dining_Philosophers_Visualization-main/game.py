@@ -0,0 +1,58 @@
+from enum import Enum, auto
+import logging
+import random
+
+logger = logging.getLogger("dining_philosophers")
+
+
+# Up to this number of philosophers the long table fits on the screen, the round table is used above it.
+LONG_TABLE_LIMIT = 10
+# Bites in a plate of spaghetti
+MEAL_SIZE = 10
+# Seconds a restart waits for the threads of the previous game to stop
+STOP_TIMEOUT = 0.5
+# Most frames drawn in a second, the screen is only redrawn when something changed
+FRAME_RATE = 60
+
+class ButtonState(Enum):
+    START = auto()
+    RESTART = auto()
+    ADDITION = auto()
+    SUBTRACTION = auto()
+
+
+class PhiloshoperNumber():
+    def __init__(self, starting_number=None):
+        self.MIN_LIMIT = 2
+        self.MAX_LIMIT = 200
+        if starting_number is None:
+            self.number = random.randint(self.MIN_LIMIT, self.MAX_LIMIT)
+        else:
+            self.number = starting_number
+        self.lock = False
+
+    def change_number(self, change):
+        if self.lock:
+            return
+        if self.number + change < self.MIN_LIMIT:
+            self.number = self.MIN_LIMIT
+        elif self.number + change > self.MAX_LIMIT:
+            self.number = self.MAX_LIMIT
+        else:
+            self.number += change
+        logger.info(f"Number of philosophers: {self.number}")
+
+    def get_number(self):
+        return self.number
+
+    def lock_number(self):
+        self.lock = True
+
+    def unlock_number(self):
+        self.lock = False
+
+    def __str__(self) -> str:
+        return str(self.number)
+
+    def __repr__(self) -> str:
+        return self.__str__()
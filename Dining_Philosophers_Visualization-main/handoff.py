@@ -0,0 +1,69 @@
+from itertools import count
+from threading import Condition, Lock
+import heapq
+
+
+class HandoffLock:
+    """Lock with a queue of waiters, release() hands it straight to the next one
+
+    The lock never becomes free while someone waits for it, so a waiter cannot lose it to a
+    thread arriving later and the lock is never idle in between. Waiters are served in arrival
+    order with fairness "fifo", lowest priority first with "priority", arrival order between equals.
+    Every waiter sleeps on its own condition over the lock, so a release wakes only the next one.
+    A waiter given an interrupt event gives up once it is set and wake() is called.
+    """
+
+    def __init__(self, fairness="fifo"):
+        if fairness not in ("fifo", "priority"):
+            raise ValueError(f"Unknown fairness {fairness}, expected fifo or priority")
+        self.fairness = fairness
+        self.lock = Lock()
+        self.held = False
+        self.waiters = []
+        self.sequence = count()
+
+    def locked(self):
+        return self.held
+
+    def acquire(self, blocking=True, timeout=None, priority=0, interrupt=None):
+        """Takes the lock, returns False on timeout or once the interrupt event is set and wake() called"""
+        with self.lock:
+            if not self.held:
+                self.held = True
+                return True
+            if not blocking:
+                return False
+            # [granted, condition], granted is set by the release handing the lock over
+            waiter = [False, Condition(self.lock)]
+            key = (priority if self.fairness == "priority" else 0, next(self.sequence))
+            heapq.heappush(self.waiters, (key, waiter))
+            waiter[1].wait_for(lambda: waiter[0] or (interrupt is not None and interrupt.is_set()), timeout)
+            if not waiter[0]:
+                # Gave up before the lock was handed over
+                self.waiters.remove((key, waiter))
+                heapq.heapify(self.waiters)
+            return waiter[0]
+
+    def release(self):
+        with self.lock:
+            if not self.held:
+                raise RuntimeError("release unlocked lock")
+            if self.waiters:
+                _, waiter = heapq.heappop(self.waiters)
+                waiter[0] = True
+                waiter[1].notify()
+            else:
+                self.held = False
+
+    def wake(self):
+        """Wakes every waiter to check its interrupt"""
+        with self.lock:
+            for _, waiter in self.waiters:
+                waiter[1].notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exception):
+        self.release()
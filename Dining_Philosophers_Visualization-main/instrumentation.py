@@ -0,0 +1,169 @@
+from array import array
+from threading import Lock
+import time
+from simulation import Event
+
+# Histogram buckets keep this many significant bits, about 3% precision
+SIGNIFICANT_BITS = 5
+_SUB_BUCKETS = 1 << SIGNIFICANT_BITS
+_HALF_BUCKETS = _SUB_BUCKETS >> 1
+_BUCKETS = _SUB_BUCKETS + (64 - SIGNIFICANT_BITS) * _HALF_BUCKETS
+
+
+def _bucket(value):
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SIGNIFICANT_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF_BUCKETS + (value >> shift) - _HALF_BUCKETS
+
+
+def _bucket_value(index):
+    """Highest value falling in the bucket"""
+    if index < _SUB_BUCKETS:
+        return index
+    shift = (index - _SUB_BUCKETS) // _HALF_BUCKETS + 1
+    mantissa = (index - _SUB_BUCKETS) % _HALF_BUCKETS + _HALF_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-linear histogram of non negative integers (nanoseconds), preallocated and fixed size"""
+
+    def __init__(self):
+        self.counts = array('q', bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts[:] = self.counts
+        histogram.count, histogram.total, histogram.max = self.count, self.total, self.max
+        return histogram
+
+    def merge(self, other):
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the q quantile, q between 0 and 1"""
+        if self.count == 0:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, p50, p99 and max, in seconds"""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e9 if self.count else 0.0,
+            "p50": self.percentile(0.5) / 1e9,
+            "p99": self.percentile(0.99) / 1e9,
+            "max": self.max / 1e9,
+        }
+
+
+class Instrumentation:
+    """Observer counting chopstick attempts and timing waits and holds with the monotonic clock
+
+    Every counter is preallocated and only written by the thread of the philosopher it belongs
+    to, or by the philosopher holding the chopstick, so counting takes no lock. Waits and holds go
+    to one histogram each for the whole table, under a lock, so snapshot() only copies those two
+    and costs the same whatever the size of the table. It can be called at any time from another
+    thread and copies the counters as they are.
+    With per_philosopher, every philosopher and chopstick also gets histograms of its own, 8 KB
+    each allocated on its first record, and the snapshot summarizes all of them.
+    """
+
+    def __init__(self, number_of_philosophers, per_philosopher=False):
+        n = number_of_philosophers
+        self.number_of_philosophers = n
+        self.attempts = array('q', bytes(8 * n))
+        self.failures = array('q', bytes(8 * n))
+        self.acquisitions = array('q', bytes(8 * n))
+        self.hungry_since = array('q', bytes(8 * n))
+        self.held_since = array('q', bytes(8 * n))
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.lock = Lock()
+        self.per_philosopher = per_philosopher
+        self.waits = [None] * n if per_philosopher else None
+        self.holds = [None] * n if per_philosopher else None
+
+    def __call__(self, event, philosopher, chopstick):
+        now = time.monotonic_ns()
+        if event == Event.ACQUIRE:
+            self.attempts[philosopher] += 1
+            self.acquisitions[chopstick] += 1
+            self.held_since[chopstick] = now
+        elif event == Event.RELEASE:
+            self.record(self.hold, self.holds, chopstick, now - self.held_since[chopstick])
+        elif event == Event.ACQUIRE_FAILED:
+            self.attempts[philosopher] += 1
+            self.failures[philosopher] += 1
+        elif event == Event.HUNGRY:
+            if self.hungry_since[philosopher] == 0:
+                self.hungry_since[philosopher] = now
+        elif event == Event.EAT:
+            self.record(self.wait, self.waits, philosopher, now - self.hungry_since[philosopher])
+            self.hungry_since[philosopher] = 0
+
+    def record(self, total, histograms, index, value):
+        with self.lock:
+            total.record(value)
+        if histograms is not None:
+            histogram = histograms[index]
+            if histogram is None:
+                histogram = histograms[index] = Histogram()
+            histogram.record(value)
+
+    def snapshot(self):
+        """Copies the counters and summarizes the histograms, without stopping the simulation
+
+        The per-philosopher summaries, philosopher_waits and chopstick_holds, are only there
+        with per_philosopher.
+        """
+        with self.lock:
+            wait = self.wait.copy()
+            hold = self.hold.copy()
+        snapshot = {
+            "attempts": self.attempts.tolist(),
+            "failures": self.failures.tolist(),
+            "acquisitions": self.acquisitions.tolist(),
+            "wait": wait.summary(),
+            "hold": hold.summary(),
+        }
+        if self.per_philosopher:
+            empty = Histogram().summary()
+            snapshot["philosopher_waits"] = [empty if histogram is None else histogram.summary()
+                                             for histogram in self.waits]
+            snapshot["chopstick_holds"] = [empty if histogram is None else histogram.summary()
+                                           for histogram in self.holds]
+        return snapshot
+
+
+def format_snapshot(snapshot):
+    """One line summary of a snapshot for the console and the overlay"""
+    attempts = sum(snapshot["attempts"])
+    failures = sum(snapshot["failures"])
+    wait = snapshot["wait"]
+    hold = snapshot["hold"]
+    return (f"wait p50 {wait['p50'] * 1000:.0f}ms p99 {wait['p99'] * 1000:.0f}ms  "
+            f"hold p50 {hold['p50'] * 1000:.0f}ms  failed {failures}/{attempts}")
@@ -0,0 +1,189 @@
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+MULTIPLIER = 4
+LEG = 6 * MULTIPLIER
+MID = 17 * MULTIPLIER
+XS = 240
+YS = 250
+
+# Unscaled sizes of the sprites placed by the layouts
+CHARACTER_SIZE = 16
+MEAL_SIZE = 32
+CHOPSTICK_SIZE = 30
+# The top of assets/round_table_v2.png is a circle of this radius and center, the legs hang below it
+ROUND_TABLE_TOP_RADIUS = 41
+ROUND_TABLE_TOP_CENTER = (50, 48)
+
+# Unscaled offset of each chair from the philosopher sitting on it
+CHAIR_OFFSETS = {
+    "assets/chair_left_2.png": (0, 0),
+    "assets/chair_right_2.png": (0, 0),
+    "assets/chair_front_2.png": (0, -2.5),
+    "assets/chair_back_2.png": (0, 6),
+}
+
+# Rows of assets/characters.png, given to the seats in order
+CHARACTER_IDS = (5, 15, 3, 1, 8, 14, 7, 6, 12, 11)
+
+# The round table is kept inside the area above the buttons
+ROUND_TABLE_CENTER = (400, 270)
+ROUND_TABLE_MAX_RADIUS = 200
+ROUND_TABLE_MIN_RADIUS = 110
+
+# Furniture and Seat locations are top left corners, chopstick locations are centers.
+Furniture = namedtuple("Furniture", ["image", "location", "scale_factor"])
+Seat = namedtuple("Seat", ["chair_image", "chair_location", "character_id", "state_id",
+                           "character_location", "meal_location"])
+ChopstickPlacement = namedtuple("ChopstickPlacement", ["image", "location", "angle"])
+Layout = namedtuple("Layout", ["table", "seats", "chopsticks", "scale_factor"])
+
+
+def _seat(index, chair_image, character_location, state_id, meal_location, scale_factor=MULTIPLIER):
+    """Builds a seat with the chair placed under the character"""
+    offset_x, offset_y = CHAIR_OFFSETS[chair_image]
+    chair_location = (
+        round(character_location[0] + offset_x * scale_factor),
+        round(character_location[1] + offset_y * scale_factor),
+    )
+    return Seat(chair_image, chair_location, CHARACTER_IDS[index % len(CHARACTER_IDS)], state_id,
+                character_location, meal_location)
+
+
+def _long_table(number):
+    """Lays out a table with one seat at each end and the others along both sides of the middle segments"""
+    top_count = math.ceil((number - 2) / 2)
+    bottom_count = number - 2 - top_count
+    middle_count = max(1, top_count)
+    right_x = XS + LEG + MID * middle_count
+    middle_x = [XS + LEG + MID * k for k in range(middle_count)]
+
+    table = [Furniture("assets/table_left.png", (XS, YS), MULTIPLIER)]
+    table.extend(Furniture("assets/table_middle.png", (x, YS), MULTIPLIER) for x in middle_x)
+    table.append(Furniture("assets/table_right.png", (right_x, YS), MULTIPLIER))
+
+    # Seats go clockwise: left end, top side from left to right, right end, bottom side from right to left.
+    seat_order = [("left", None)]
+    seat_order.extend(("top", k) for k in range(top_count))
+    seat_order.append(("right", None))
+    seat_order.extend(("bottom", k) for k in reversed(range(bottom_count)))
+
+    seats = []
+    for index, (side, k) in enumerate(seat_order):
+        if side == "left":
+            seats.append(_seat(index, "assets/chair_left_2.png", (XS - 50, YS + 5), 2, (XS + 10, YS + 20)))
+        elif side == "right":
+            seats.append(_seat(index, "assets/chair_right_2.png", (right_x + LEG, YS + 10), -2,
+                               (right_x - 16, YS + 20)))
+        elif side == "top":
+            seats.append(_seat(index, "assets/chair_front_2.png", (middle_x[k] + 6, YS - 80), 4,
+                               (middle_x[k] + 20, YS + 5)))
+        else:
+            seats.append(_seat(index, "assets/chair_back_2.png", (middle_x[k] + 6, YS + 70), 1,
+                               (middle_x[k] + 20, YS + 40)))
+
+    # The chopstick after seat i lies between seat i and seat i + 1, it is chopstick i + 1.
+    chopsticks = []
+    for index, (side, k) in enumerate(seat_order):
+        next_side, next_k = seat_order[(index + 1) % number]
+        if side == "left" and next_side == "top":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45r.png", (XS + 30, YS + 20), 135))
+        elif side == "top" and next_side == "top":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_up.png", (middle_x[next_k], YS + 20), 90))
+        elif side == "top" and next_side == "right":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45.png", (right_x - 12, YS + 25), 45))
+        elif side == "right" and next_side == "bottom":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45r.png", (right_x - 12, YS + 60), 315))
+        elif side == "bottom" and next_side == "bottom":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_up.png", (middle_x[k], YS + 60), 270))
+        elif side == "bottom" and next_side == "left":
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45.png", (XS + 40, YS + 55), 225))
+        elif side == "left":
+            # Only two seats, the chopstick goes on the top side
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45.png", ((XS + right_x) // 2 + 12, YS + 20), 90))
+        else:
+            # No seat on the bottom side
+            chopsticks.append(ChopstickPlacement("assets/chopstick_45.png", ((XS + right_x) // 2 + 12, YS + 55), 270))
+    # Chopstick i lies between seat i - 1 and seat i, philosopher i eats with chopsticks i and i + 1
+    chopsticks = chopsticks[-1:] + chopsticks[:-1]
+
+    return Layout(tuple(table), tuple(seats), tuple(chopsticks), MULTIPLIER)
+
+
+def _round_table(number):
+    """Lays out the seats evenly around a round table, shrinking the sprites when they do not fit"""
+    scale_factor = MULTIPLIER
+    spacing = CHARACTER_SIZE * 1.1
+    radius = max(ROUND_TABLE_MIN_RADIUS, number * spacing * scale_factor / (2 * math.pi))
+    if radius > ROUND_TABLE_MAX_RADIUS:
+        radius = ROUND_TABLE_MAX_RADIUS
+        scale_factor = 2 * math.pi * radius / (number * spacing)
+    half = CHARACTER_SIZE * scale_factor / 2
+    table_radius = radius - half
+    center_x, center_y = ROUND_TABLE_CENTER
+
+    table_scale = table_radius / ROUND_TABLE_TOP_RADIUS
+    table = (Furniture("assets/round_table_v2.png",
+                       (round(center_x - ROUND_TABLE_TOP_CENTER[0] * table_scale),
+                        round(center_y - ROUND_TABLE_TOP_CENTER[1] * table_scale)), table_scale),)
+
+    meal_half = MEAL_SIZE * scale_factor / MULTIPLIER / 2
+    meal_radius = table_radius - meal_half * 1.2
+    seats = []
+    for index in range(number):
+        # Starts on the left end and goes clockwise, like the long table.
+        angle = math.pi + 2 * math.pi * index / number
+        cos, sin = math.cos(angle), math.sin(angle)
+        if abs(cos) >= abs(sin):
+            chair_image, state_id = ("assets/chair_right_2.png", -2) if cos > 0 else ("assets/chair_left_2.png", 2)
+        else:
+            chair_image, state_id = ("assets/chair_back_2.png", 1) if sin > 0 else ("assets/chair_front_2.png", 4)
+        character_location = (round(center_x + radius * cos - half), round(center_y + radius * sin - half))
+        meal_location = (round(center_x + meal_radius * cos - meal_half),
+                         round(center_y + meal_radius * sin - meal_half))
+        seats.append(_seat(index, chair_image, character_location, state_id, meal_location, scale_factor))
+
+    chopstick_radius = table_radius - CHOPSTICK_SIZE * scale_factor / MULTIPLIER / 2
+    chopsticks = []
+    for index in range(number):
+        # Chopstick i lies between seat i - 1 and seat i
+        angle = math.pi + 2 * math.pi * (index - 0.5) / number
+        cos, sin = math.cos(angle), math.sin(angle)
+        if max(abs(cos), abs(sin)) > 0.92:
+            image = "assets/chopstick_up.png"
+        elif cos * sin > 0:
+            image = "assets/chopstick_45r.png"
+        else:
+            image = "assets/chopstick_45.png"
+        location = (round(center_x + chopstick_radius * cos), round(center_y + chopstick_radius * sin))
+        chopsticks.append(ChopstickPlacement(image, location, math.degrees(-angle) % 360))
+
+    return Layout(table, tuple(seats), tuple(chopsticks), scale_factor)
+
+
+LAYOUTS = {
+    "long": _long_table,
+    "round": _round_table,
+}
+
+
+@lru_cache(maxsize=None)
+def table_layout(number, shape="long"):
+    """Computes the position of the table, chairs, philosophers, meals and chopsticks
+    Parameters
+    ----------
+    number : int
+        The number of philosophers, at least 2
+    shape : str
+        "long" for a table made of repeated middle segments, "round" for a round table
+    Returns
+    -------
+    layout : Layout
+        Seat i holds philosopher i, who eats with chopsticks i and (i + 1) % number
+    """
+    if number < 2:
+        raise ValueError("Number of philosophers must be at least 2")
+    if shape not in LAYOUTS:
+        raise ValueError(f"Unknown table shape: {shape}")
+    return LAYOUTS[shape](number)
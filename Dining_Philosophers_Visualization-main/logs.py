@@ -0,0 +1,99 @@
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+import atexit
+import json
+import logging
+
+FORMAT = '%(asctime)s:%(name)s:%(levelname)s:%(message)s'
+# Attributes of the records of simulation events, written as fields by JsonFormatter
+EVENT_FIELDS = ("event", "philosopher", "chopstick")
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Puts the record itself on the queue, the message is formatted by the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """File handler leaving the flushes to BatchingListener, once per batch of records"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchingListener(QueueListener):
+    """Handles the queued records and flushes the handlers whenever the queue is drained"""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                getattr(handler, "flush_batch", handler.flush)()
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line, with the event fields of the simulation records"""
+
+    def format(self, record):
+        document = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in EVENT_FIELDS:
+            if hasattr(record, field):
+                document[field] = getattr(record, field)
+        return json.dumps(document)
+
+
+def configure(path="dining_philosophers.log", level=logging.INFO, structured=False, stream=True, events=False):
+    """Routes every logger through a queue to a single listener thread writing the file and the console
+
+    Loggers only append records to the queue, the file is written by the listener in batches.
+    With events, the "simulation" logger of EventLogger logs at DEBUG level whatever the level.
+    Returns the listener, it is stopped and flushed at exit.
+    """
+    formatter = JsonFormatter() if structured else logging.Formatter(FORMAT)
+    handlers = [BatchingFileHandler(path)]
+    if stream:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    queue = SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(DeferredQueueHandler(queue))
+    if events:
+        logging.getLogger("simulation").setLevel(logging.DEBUG)
+    listener = BatchingListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class EventLogger:
+    """Observer logging one simulation event out of sample at DEBUG level, with structured fields
+
+    Nothing is done for the events that are not sampled or when DEBUG is disabled, and the record
+    is formatted by the listener thread, so tracing does not slow the philosophers down.
+    """
+
+    def __init__(self, logger=None, sample=1):
+        if sample < 1:
+            raise ValueError(f"Cannot log one event out of {sample}, the sample must be at least 1")
+        self.logger = logger or logging.getLogger("simulation")
+        self.sample = sample
+        self.counter = count()
+
+    def __call__(self, event, philosopher, chopstick):
+        if next(self.counter) % self.sample or not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self.logger.debug("%s philosopher %d chopstick %s", event.name, philosopher, chopstick,
+                          extra={"event": event.name, "philosopher": philosopher, "chopstick": chopstick})
@@ -0,0 +1,118 @@
+from threading import Condition
+import sys
+import time
+from instrumentation import format_snapshot
+from simulation import HOLDER_SYMBOLS, STATUS_SYMBOLS, Event, State
+
+# Rows of the console table, a bit each in the dirty mask
+STATUS_ROW = 1
+HOLDER_ROW = 2
+MEAL_ROW = 4
+ALL_ROWS = STATUS_ROW | HOLDER_ROW | MEAL_ROW
+
+EVENT_STATES = {
+    Event.THINK: State.THINKING,
+    Event.HUNGRY: State.HUNGRY,
+    Event.EAT: State.EATING,
+    Event.FINISH: State.THINKING,
+}
+
+
+class ConsoleMonitor:
+    """Observer printing the table to the console when it changes, at most once per interval
+
+    The observer only updates the cell of the philosopher of the event, the eating and remaining
+    meal totals and a mask of the rows that changed, then notifies a condition. run() sleeps on
+    that condition, so nothing is printed while the table is idle, and only rebuilds the changed
+    rows. On a terminal the changed rows are rewritten in place, otherwise the table is printed
+    again below the previous one.
+    """
+
+    def __init__(self, simulation, instrumentation=None, interval=0.1, output=None):
+        snapshot = simulation.snapshot()
+        n = simulation.number_of_philosophers
+        self.number_of_philosophers = n
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self.output = output or sys.stdout
+        self.in_place = self.output.isatty()
+        self.states = list(snapshot.states)
+        self.status = [STATUS_SYMBOLS[state] for state in snapshot.states]
+        self.holders = [HOLDER_SYMBOLS[held] for held in snapshot.held]
+        self.held = list(snapshot.held)
+        self.meals = list(snapshot.meals)
+        self.meal_cells = ["{:3d}  ".format(meals) for meals in snapshot.meals]
+        self.eating = self.states.count(State.EATING)
+        self.remaining = sum(self.meals)
+        self.dirty = ALL_ROWS
+        self.changed = Condition()
+        self.rows = None
+        simulation.add_observer(self)
+
+    def __call__(self, event, philosopher, chopstick):
+        # The cells of philosopher i are only written from its own thread, the totals need the lock
+        if event in EVENT_STATES:
+            state = EVENT_STATES[event]
+            eating = (state == State.EATING) - (self.states[philosopher] == State.EATING)
+            self.states[philosopher] = state
+            self.status[philosopher] = STATUS_SYMBOLS[state]
+            with self.changed:
+                self.eating += eating
+                self.dirty |= STATUS_ROW
+                self.changed.notify()
+        elif event == Event.ACQUIRE or event == Event.RELEASE:
+            self.held[philosopher] += 1 if event == Event.ACQUIRE else -1
+            self.holders[philosopher] = HOLDER_SYMBOLS[self.held[philosopher]]
+            with self.changed:
+                self.dirty |= HOLDER_ROW
+                self.changed.notify()
+        elif event == Event.BITE:
+            self.meals[philosopher] -= 1
+            self.meal_cells[philosopher] = "{:3d}  ".format(self.meals[philosopher])
+            with self.changed:
+                self.remaining -= 1
+                self.dirty |= MEAL_ROW
+                self.changed.notify()
+
+    def build_rows(self, dirty, eating, remaining):
+        if self.rows is None:
+            self.rows = ["=" * (self.number_of_philosophers * 5), "", "", "", ""]
+        rows = self.rows
+        if dirty & STATUS_ROW:
+            rows[1] = "".join(self.status) + "  :  " + str(eating)
+        if dirty & HOLDER_ROW:
+            rows[2] = "".join(self.holders)
+        if dirty & MEAL_ROW:
+            rows[3] = "".join(self.meal_cells) + "  :  " + str(remaining)
+        if self.instrumentation is not None:
+            rows[4] = format_snapshot(self.instrumentation.snapshot())
+        return rows
+
+    def draw(self, dirty, eating, remaining, first):
+        rows = self.build_rows(dirty, eating, remaining)
+        count = len(rows) if self.instrumentation is not None else len(rows) - 1
+        if not self.in_place or first:
+            self.output.write("".join(row + "\n" for row in rows[:count]))
+        else:
+            # Back to the first row, then rewrite the changed rows and skip the others
+            parts = [f"\x1b[{count}F"]
+            for index in range(count):
+                changed = index == 4 or (index and dirty & (1 << (index - 1)))
+                parts.append("\x1b[2K" + rows[index] + "\n" if changed else "\x1b[1E")
+            self.output.write("".join(parts))
+        self.output.flush()
+
+    def run(self):
+        """Prints the table on every change until no meal is left"""
+        first = True
+        while True:
+            with self.changed:
+                while not self.dirty:
+                    self.changed.wait()
+                dirty, eating, remaining = self.dirty, self.eating, self.remaining
+                self.dirty = 0
+            self.draw(dirty, eating, remaining, first)
+            first = False
+            if remaining <= 0:
+                return
+            time.sleep(self.interval)
@@ -0,0 +1,111 @@
+from threading import Thread
+import multiprocessing
+import os
+import random
+import resource
+from simulation import Simulation
+from state import SharedTableState
+
+# Workers are forked, so they inherit the shared table, the locks and the timing functions
+_context = multiprocessing.get_context("fork")
+
+
+class ProcessSimulation(Simulation):
+    """Spreads the philosophers over worker processes, so they contend on all the cores
+
+    Philosopher i runs as a thread of worker i % processes. The chopsticks are multiprocessing
+    locks taken without blocking, and the table is a SharedTableState the parent reads in place.
+    Events happen in the workers: when observers are registered before start(), the workers
+    send their events through a queue and a thread of the parent calls the observers with them,
+    a little later than they happened.
+    The default timings and any timing.Timing give every philosopher a stream of its own, drawn
+    from in its worker. Each worker also reseeds the global random generator, so a timing using it
+    differs between them, while one drawing from a generator of its own would repeat the same
+    durations in every worker.
+    """
+
+    def __init__(self, number_of_philosophers, meal_size=9, *args, processes=None, **kwargs):
+        super().__init__(number_of_philosophers, meal_size, *args, **kwargs)
+        self.table = SharedTableState(number_of_philosophers, meal_size, _context.Lock())
+        self.stopping = _context.Event()
+        self.processes = min(processes or os.cpu_count() or 1, number_of_philosophers)
+        self.workers = []
+        self.events = None
+        self.relay = None
+        # Peak RSS of each worker, in ru_maxrss units, written by the worker as it finishes
+        self.worker_rss = _context.RawArray('q', self.processes)
+
+    def new_chopstick(self):
+        return _context.Lock()
+
+    def pick_up(self, i, chopstick):
+        return self.chopsticks[chopstick].acquire(False)
+
+    def work(self, worker):
+        random.seed(f"{os.getpid()}/{worker}")
+        if self.events is not None:
+            events = self.events
+            self.observers = [lambda event, i, chopstick: events.put((event, i, chopstick))]
+        else:
+            self.observers = []
+        self.start_threads(range(worker, self.number_of_philosophers, self.processes))
+        Simulation.join(self)
+        self.worker_rss[worker] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self.events is not None:
+            self.events.put(None)
+
+    def dispatch(self):
+        finished = 0
+        while finished < len(self.workers):
+            message = self.events.get()
+            if message is None:
+                finished += 1
+                continue
+            event, i, chopstick = message
+            for observer in self.observers:
+                observer(event, i, chopstick)
+
+    def start(self, workers=None):
+        if workers:
+            raise ValueError("Worker processes run one thread per philosopher, a worker pool is not supported")
+        if self.observers:
+            self.events = _context.SimpleQueue()
+        self.workers = [_context.Process(target=self.work, args=(worker,), daemon=True)
+                        for worker in range(self.processes)]
+        for worker in self.workers:
+            worker.start()
+        if self.events is not None:
+            self.relay = Thread(target=self.dispatch, daemon=True)
+            self.relay.start()
+
+    def join(self, timeout=None):
+        for worker in self.workers:
+            worker.join(timeout)
+        if self.relay is not None:
+            self.relay.join(timeout)
+
+    def worker_peak_rss(self):
+        """Sum of the peak RSS of the finished workers, in ru_maxrss units, pages shared with the parent included"""
+        return sum(self.worker_rss)
+
+    def alive_threads(self):
+        alive = sum(worker.is_alive() for worker in self.workers)
+        return alive + (self.relay is not None and self.relay.is_alive())
+
+
+def main():
+    from instrumentation import Instrumentation
+    from monitor import ConsoleMonitor
+    n = 10
+    m = 7
+    dining_philosophers = ProcessSimulation(n, m)
+    instrumentation = Instrumentation(n)
+    dining_philosophers.add_observer(instrumentation)
+    monitor = ConsoleMonitor(dining_philosophers, instrumentation)
+    dining_philosophers.start()
+    monitor.run()
+    dining_philosophers.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+from math import ceil
+from queue import SimpleQueue
+from threading import Event as Flag, Lock, Thread
+import time
+from simulation import Event, State
+from state import FREE
+
+
+class TimerWheel:
+    """Hashed timing wheel, schedule and advance are O(1) per timer whatever the number of timers
+
+    Deadlines are rounded up to the resolution. A timer more than one turn of the wheel away
+    stays in its slot until the turn it is due.
+    """
+
+    def __init__(self, resolution=0.001, slots=1024):
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.origin = time.monotonic()
+        self.tick = 0
+        self.lock = Lock()
+
+    def schedule(self, delay, item):
+        with self.lock:
+            tick = max(self.tick + 1, ceil((time.monotonic() + delay - self.origin) / self.resolution))
+            self.slots[tick % len(self.slots)].append((tick, item))
+
+    def advance(self, now):
+        """Returns the items due at the monotonic time now"""
+        due = []
+        with self.lock:
+            target = int((now - self.origin) / self.resolution)
+            # After a long pause one turn visits every slot
+            last = min(target, self.tick + len(self.slots))
+            while self.tick < last:
+                self.tick += 1
+                slot = self.slots[self.tick % len(self.slots)]
+                if slot:
+                    pending = [timer for timer in slot if timer[0] > target]
+                    due.extend(item for tick, item in slot if tick <= target)
+                    slot[:] = pending
+            self.tick = max(self.tick, target)
+        return due
+
+
+class Scheduler:
+    """Runs the philosophers of a simulation as steps on a fixed pool of worker threads
+
+    A step never sleeps: think, reach and eat times are timers on the wheel, and a philosopher
+    that finds a chopstick taken parks on it until it is released, still hungry, instead of
+    thinking again. The pick_up of the simulation must not block, which is the case of the
+    check-then-take strategy of w_lock.
+    """
+
+    def __init__(self, simulation, workers=4, resolution=0.001):
+        self.simulation = simulation
+        n = simulation.number_of_philosophers
+        self.number_of_workers = workers
+        self.wheel = TimerWheel(resolution)
+        self.runnable = SimpleQueue()
+        self.parked = [[] for _ in range(n)]
+        self.park_lock = Lock()
+        self.dining = n
+        self.dining_lock = Lock()
+        self.stopped = Flag()
+        self.threads = []
+
+    def later(self, delay, step, i):
+        self.wheel.schedule(delay, (step, i))
+
+    def park(self, i, chopstick):
+        with self.park_lock:
+            # Checked under the lock so a release between the failed take and here is not missed
+            if self.simulation.table.holders[chopstick] != FREE:
+                self.parked[chopstick].append(i)
+                return
+        self.runnable.put((self.hungry, i))
+
+    def wake(self, chopstick):
+        with self.park_lock:
+            waiting, self.parked[chopstick] = self.parked[chopstick], []
+        for i in waiting:
+            self.runnable.put((self.hungry, i))
+
+    def think(self, i):
+        self.simulation.set_state(i, State.THINKING, Event.THINK)
+        self.later(self.simulation.think_times[i](), self.hungry, i)
+
+    def hungry(self, i):
+        simulation = self.simulation
+        if simulation.states[i] != State.HUNGRY:
+            simulation.set_state(i, State.HUNGRY, Event.HUNGRY)
+        if simulation.take(i, i):
+            self.later(simulation.reach_times[i](), self.reach, i)
+        else:
+            self.park(i, i)
+
+    def reach(self, i):
+        simulation = self.simulation
+        right = (i + 1) % simulation.number_of_philosophers
+        if simulation.take(i, right):
+            simulation.set_state(i, State.EATING, Event.EAT)
+            self.later(simulation.eat_times[i](), self.bite, i)
+        else:
+            simulation.give_back(i, i)
+            self.wake(i)
+            self.park(i, right)
+
+    def bite(self, i):
+        simulation = self.simulation
+        right = (i + 1) % simulation.number_of_philosophers
+        simulation.table.bite(i)
+        simulation.notify(Event.BITE, i)
+        simulation.release(i, i, right)
+        self.wake(right)
+        self.wake(i)
+        if simulation.meals[i] > 0:
+            self.think(i)
+            return
+        simulation.set_state(i, State.THINKING, Event.FINISH)
+        with self.dining_lock:
+            self.dining -= 1
+            done = self.dining == 0
+        if done:
+            self.stop()
+
+    def work(self):
+        while True:
+            task = self.runnable.get()
+            if task is None:
+                return
+            step, i = task
+            step(i)
+
+    def tick(self):
+        while not self.stopped.wait(self.wheel.resolution):
+            for task in self.wheel.advance(time.monotonic()):
+                self.runnable.put(task)
+
+    def start(self):
+        simulation = self.simulation
+        for i in range(simulation.number_of_philosophers):
+            if simulation.meals[i] > 0:
+                self.runnable.put((self.think, i))
+            else:
+                self.dining -= 1
+        self.threads = [Thread(target=self.work) for _ in range(self.number_of_workers)]
+        self.threads.append(Thread(target=self.tick))
+        for thread in self.threads:
+            thread.start()
+        if self.dining == 0:
+            self.stop()
+
+    def stop(self):
+        self.stopped.set()
+        for _ in range(self.number_of_workers):
+            self.runnable.put(None)
+
+
+def main():
+    import argparse
+    from timing import Uniform, timings
+    from w_lock import DiningPhilosophers
+    parser = argparse.ArgumentParser(description="Runs a large table on a small pool of worker threads")
+    parser.add_argument("-n", "--philosophers", type=int, default=10000)
+    parser.add_argument("-m", "--meals", type=int, default=3)
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("--sleep-scale", type=float, default=0.01,
+                        help="think, eat and reach times are uniform between 0 and the scale, in seconds")
+    arguments = parser.parse_args()
+    uniform = Uniform(0, arguments.sleep_scale)
+    simulation = DiningPhilosophers(arguments.philosophers, arguments.meals,
+                                    **timings(uniform, uniform, uniform, seed=0))
+    started = time.monotonic()
+    simulation.run(workers=arguments.workers)
+    elapsed = time.monotonic() - started
+    meals = arguments.philosophers * arguments.meals
+    print(f"{arguments.philosophers} philosophers on {arguments.workers} workers ate {meals} meals "
+          f"in {elapsed:.1f}s ({meals / elapsed:.0f} meals/s)")
+
+
+if __name__ == "__main__":
+    main()
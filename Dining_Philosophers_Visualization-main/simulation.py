@@ -0,0 +1,262 @@
+from enum import IntEnum, auto
+from threading import Condition, Event as Flag, Thread, Lock
+from state import TableState
+
+
+class State(IntEnum):
+    THINKING = 0
+    HUNGRY = auto()
+    EATING = auto()
+
+
+class Event(IntEnum):
+    THINK = 0
+    HUNGRY = auto()
+    ACQUIRE = auto()
+    ACQUIRE_FAILED = auto()
+    RELEASE = auto()
+    EAT = auto()
+    BITE = auto()
+    FINISH = auto()
+    WAIT = auto()
+
+
+# Console rendering of the states and of the number of chopsticks held
+STATUS_SYMBOLS = {State.THINKING: '  T  ', State.HUNGRY: '  _  ', State.EATING: '  E  '}
+HOLDER_SYMBOLS = ('     ', ' /   ', ' / \\ ')
+
+
+def per_philosopher(timing, number_of_philosophers):
+    """One callable per philosopher: the streams of a timing.Timing, or the same plain callable for all"""
+    stream = getattr(timing, "stream", None)
+    if stream is None:
+        return [timing] * number_of_philosophers
+    return [stream(i) for i in range(number_of_philosophers)]
+
+
+class StoppableSemaphore:
+    """Semaphore whose blocked acquires give up once the stopping event is set
+
+    Waiters sleep on a condition until a permit is released, wake() makes them check the event
+    again, so a stop reaches them at once without any of them polling.
+    """
+
+    def __init__(self, value, stopping):
+        self.condition = Condition(Lock())
+        self.value = value
+        self.stopping = stopping
+
+    def locked(self):
+        return self.value == 0
+
+    def acquire(self, blocking=True, timeout=None):
+        """Takes a permit, returns False on timeout or once the simulation is stopped"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.value > 0 or self.stopping.is_set(), timeout if blocking else 0)
+            if self.value == 0 or self.stopping.is_set():
+                return False
+            self.value -= 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.value += 1
+            self.condition.notify()
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+
+class Simulation:
+    """Philosophers, chopsticks and meals of a table, without any rendering
+
+    Philosopher i eats with chopsticks i and (i + 1) % n. Front-ends register observers,
+    which are called as observer(event, philosopher, chopstick) from the philosopher threads,
+    chopstick is None for events that do not involve one.
+    The state lives in a TableState, snapshot() returns a consistent copy of it.
+    Subclasses change the chopstick primitive with new_chopstick, the way one is taken with pick_up
+    and the way a philosopher gets both of them with acquire and release.
+    Strategies whose pick_up blocks set blocking, take() then sends a WAIT event before waiting.
+    stop() asks every philosopher to leave the table: sleeps go through pause() and blocking
+    acquires through wait_for() on a semaphore(), which both return as soon as it is called.
+    think_time, eat_time and reach_time return seconds; a timing.Timing gives every philosopher a
+    stream of its own, read by the steps through think_times[i] and the like. The ones left out
+    are uniform between 0 and 1 second, on unseeded streams of their own.
+    """
+
+    blocking = False
+
+    def __init__(self, number_of_philosophers, meal_size=9, think_time=None, eat_time=None, reach_time=None):
+        if think_time is None or eat_time is None or reach_time is None:
+            # Imported here as timing imports this module
+            from timing import Uniform, timings
+            defaults = timings(Uniform(0, 1), Uniform(0, 1), Uniform(0, 1))
+            think_time = think_time or defaults["think_time"]
+            eat_time = eat_time or defaults["eat_time"]
+            reach_time = reach_time or defaults["reach_time"]
+        self.number_of_philosophers = number_of_philosophers
+        self.table = TableState(number_of_philosophers, meal_size)
+        self.stopping = Flag()
+        self.semaphores = []
+        self.chopsticks = [self.new_chopstick() for _ in range(number_of_philosophers)]
+        self.think_time = think_time
+        self.eat_time = eat_time
+        self.reach_time = reach_time
+        self.think_times = per_philosopher(think_time, number_of_philosophers)
+        self.eat_times = per_philosopher(eat_time, number_of_philosophers)
+        self.reach_times = per_philosopher(reach_time, number_of_philosophers)
+        self.observers = []
+        self.threads = []
+        self.scheduler = None
+
+    def new_chopstick(self):
+        return Lock()
+
+    def pick_up(self, i, chopstick):
+        """Tries to take the chopstick for philosopher i, returns whether it was taken"""
+        if self.chopsticks[chopstick].locked():
+            return False
+        self.chopsticks[chopstick].acquire()
+        return True
+
+    def put_down(self, i, chopstick):
+        self.chopsticks[chopstick].release()
+
+    def pause(self, seconds):
+        """Sleeps for seconds, returns True when the simulation was stopped in the meantime"""
+        return self.stopping.wait(seconds)
+
+    def semaphore(self, value=1):
+        """Semaphore for the blocking acquires of wait_for, stop() wakes its waiters"""
+        semaphore = StoppableSemaphore(value, self.stopping)
+        self.semaphores.append(semaphore)
+        return semaphore
+
+    def wait_for(self, semaphore, timeout=None):
+        """Acquires a semaphore(), returns False on timeout or when the simulation is stopped"""
+        return semaphore.acquire(timeout=timeout)
+
+    @property
+    def meals(self):
+        return self.table.meals
+
+    @property
+    def states(self):
+        return self.table.states
+
+    @property
+    def held(self):
+        return self.table.held
+
+    def snapshot(self):
+        return self.table.snapshot()
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def notify(self, event, i, chopstick=None):
+        for observer in self.observers:
+            observer(event, i, chopstick)
+
+    def set_state(self, i, state, event):
+        self.table.set_state(i, state)
+        self.notify(event, i)
+
+    def take(self, i, chopstick):
+        if self.blocking:
+            self.notify(Event.WAIT, i, chopstick)
+        if not self.pick_up(i, chopstick):
+            self.notify(Event.ACQUIRE_FAILED, i, chopstick)
+            return False
+        self.table.acquired(i, chopstick)
+        self.notify(Event.ACQUIRE, i, chopstick)
+        return True
+
+    def give_back(self, i, chopstick):
+        self.put_down(i, chopstick)
+        self.table.released(i, chopstick)
+        self.notify(Event.RELEASE, i, chopstick)
+
+    def acquire(self, i, left, right):
+        """Tries to take both chopsticks, returns False when philosopher i backed off"""
+        if not self.take(i, left):
+            return False
+        if not self.pause(self.reach_times[i]()) and self.take(i, right):
+            return True
+        self.give_back(i, left)
+        return False
+
+    def release(self, i, left, right):
+        self.give_back(i, right)
+        self.give_back(i, left)
+
+    def philosopher(self, i):
+        left = i
+        right = (i + 1) % self.number_of_philosophers
+        while self.meals[i] > 0:
+            self.set_state(i, State.THINKING, Event.THINK)
+            if self.pause(self.think_times[i]()):
+                break
+            self.set_state(i, State.HUNGRY, Event.HUNGRY)
+            if self.acquire(i, left, right):
+                self.set_state(i, State.EATING, Event.EAT)
+                if not self.pause(self.eat_times[i]()):
+                    self.table.bite(i)
+                    self.notify(Event.BITE, i)
+                self.release(i, left, right)
+        self.set_state(i, State.THINKING, Event.FINISH)
+
+    def start_threads(self, philosophers):
+        self.threads = [Thread(target=self.philosopher, args=(i,)) for i in philosophers]
+        for thread in self.threads:
+            thread.start()
+
+    def start(self, workers=None):
+        """Starts one thread per philosopher, or a Scheduler multiplexing them over workers threads
+
+        The scheduler takes and gives back the chopsticks itself, so only strategies keeping the
+        acquire and release of Simulation, with a pick_up that does not block, run on workers.
+        """
+        if workers:
+            own_protocol = type(self).acquire is not Simulation.acquire or type(self).release is not Simulation.release
+            if self.blocking or own_protocol:
+                raise ValueError(f"{type(self).__name__} has its own acquire, release or a blocking pick_up, "
+                                 "a worker pool is not supported")
+            from scheduler import Scheduler
+            self.scheduler = Scheduler(self, workers)
+            self.scheduler.start()
+            self.threads = self.scheduler.threads
+        else:
+            self.start_threads(range(self.number_of_philosophers))
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stop(self):
+        """Asks the philosophers to leave the table, join() then returns within milliseconds"""
+        self.stopping.set()
+        for semaphore in self.semaphores:
+            semaphore.wake()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+    def alive_threads(self):
+        """Number of threads of the simulation still running, zero once it is stopped and joined"""
+        return sum(thread.is_alive() for thread in self.threads)
+
+    def run(self, workers=None):
+        self.start(workers)
+        self.join()
+
+    def remaining_meals(self):
+        return sum(self.meals)
+
+    @property
+    def status(self):
+        return [STATUS_SYMBOLS[state] for state in self.states]
+
+    @property
+    def chopstick_holders(self):
+        return [HOLDER_SYMBOLS[held] for held in self.held]
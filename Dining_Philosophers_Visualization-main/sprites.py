@@ -0,0 +1,407 @@
+from __future__ import annotations
+import os
+import threading
+import pygame
+from atlas import SpriteAtlas
+from discrete_event import Replay, record
+from game import MEAL_SIZE, STOP_TIMEOUT, ButtonState, PhiloshoperNumber, logger
+from instrumentation import Instrumentation, format_snapshot
+from layout import MULTIPLIER
+from logs import EventLogger
+from simulation import Event, Simulation
+from state import FREE
+from timing import Uniform, load_distributions, timings
+from tracefile import TraceReader, TraceReplay, TraceWriter, game_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Posted when the simulation changed a sprite, the main loop sleeps until one arrives
+STATE_CHANGED = pygame.event.custom_type()
+
+
+def asset_path(path):
+    """Resolves the paths of the assets against this directory instead of the working directory"""
+    return os.path.join(BASE_DIR, path)
+
+
+# Process-wide cache of decoded and transformed surfaces. The surfaces are shared
+# between sprites, so they must never be drawn on.
+_surface_cache = {}
+_surface_cache_lock = threading.Lock()
+_atlas = None
+_atlas_loaded = False
+
+
+def _get_atlas():
+    """Returns the sprite atlas built by atlas.py, or None when it has not been built"""
+    global _atlas, _atlas_loaded
+    with _surface_cache_lock:
+        if not _atlas_loaded:
+            _atlas = SpriteAtlas.load()
+            _atlas_loaded = True
+        return _atlas
+
+
+def load_image(image_file, scale_factor=1, horizontal_flip=False, vertical_flip=False, rotation=0, area=None):
+    """Returns a converted surface for the image, loading it from disk only once
+    Parameters
+    ----------
+    image_file : str
+        Path of the image
+    scale_factor : float
+        Scale applied to the width and height of the image (or of the area)
+    horizontal_flip, vertical_flip : bool
+        Flips applied to the image
+    rotation : float
+        Rotation in degrees, counterclockwise
+    area : tuple
+        Optional (x, y, width, height) of a sub image, used for sprite sheets
+    Returns
+    -------
+    surface : pygame.Surface
+        A shared surface, it must not be modified
+    """
+    key = (image_file, scale_factor, horizontal_flip, vertical_flip, rotation, area)
+    with _surface_cache_lock:
+        surface = _surface_cache.get(key)
+    if surface is not None:
+        return surface
+
+    # Prefer the pre-baked atlas, at the requested scale when it has been packed.
+    surface = None
+    applied_scale = 1
+    atlas = _get_atlas()
+    if atlas is not None and os.path.dirname(image_file) == "assets":
+        image_name = os.path.basename(image_file)
+        surface = atlas.get(image_name, scale_factor)
+        if surface is not None:
+            applied_scale = scale_factor
+        else:
+            surface = atlas.get(image_name)
+
+    if surface is None:
+        if key[1:] == (1, False, False, 0, None):
+            surface = pygame.image.load(asset_path(image_file))
+            if pygame.display.get_surface() is not None:
+                if surface.get_flags() & pygame.SRCALPHA:
+                    surface = surface.convert_alpha()
+                else:
+                    surface = surface.convert()
+        else:
+            surface = load_image(image_file)
+
+    if area is not None:
+        surface = surface.subsurface(pygame.Rect([int(value * applied_scale) for value in area]))
+    if horizontal_flip or vertical_flip:
+        surface = pygame.transform.flip(surface, horizontal_flip, vertical_flip)
+    if scale_factor != applied_scale:
+        surface = pygame.transform.scale(
+            surface,
+            (
+                int(surface.get_width() * scale_factor),
+                int(surface.get_height() * scale_factor)
+            )
+        )
+    if rotation:
+        surface = pygame.transform.rotate(surface, rotation)
+
+    with _surface_cache_lock:
+        return _surface_cache.setdefault(key, surface)
+
+
+class BackgroundFurniture(pygame.sprite.Sprite):
+    def __init__(self, image_file, location, scale_factor=1.0, horizontal_flip=False, vertical_flip=False):
+        super().__init__()
+        self.image = load_image(image_file, scale_factor, horizontal_flip, vertical_flip)
+        self.rect = self.image.get_rect(center=location)
+
+class TableFurniture(pygame.sprite.Sprite):
+    def __init__(self, image_file, location, scale_factor=1.0, horizontal_flip=False, vertical_flip=False):
+        super().__init__()
+        self.image = load_image(image_file, scale_factor, horizontal_flip, vertical_flip)
+        self.rect = self.image.get_rect(x=location[0], y=location[1])
+
+
+class Chair(pygame.sprite.Sprite):
+    def __init__(self, image_file, location, scale_factor=MULTIPLIER):
+        super().__init__()
+        self.image = load_image(image_file, scale_factor)
+        self.rect = self.image.get_rect(x=location[0], y=location[1])
+
+
+class Meal(pygame.sprite.DirtySprite):
+    def __init__(self, location=(0, 0), scale_factor=1):
+        super().__init__()
+        self.scale_factor = scale_factor
+        self.image = load_image("assets/spaghetti_full.png", scale_factor)
+        self.rect = self.image.get_rect(center=location)
+        self.left_to_eat = MEAL_SIZE
+
+    def take_a_bite(self):
+        self.left_to_eat -= 1
+        if self.left_to_eat == 0:
+            self.empty()
+
+    def empty(self):
+        self.image = load_image("assets/spaghetti_empty.png", self.scale_factor)
+        self.rect = self.image.get_rect(center=self.rect.center)
+        self.dirty = 1
+
+    def is_finished(self):
+        return self.left_to_eat == 0
+
+    def set_left_to_eat(self, left_to_eat):
+        if left_to_eat == 0:
+            self.empty()
+        elif self.left_to_eat == 0:
+            self.reset()
+        self.left_to_eat = left_to_eat
+
+    def reset(self):
+        self.left_to_eat = MEAL_SIZE
+        self.image = load_image("assets/spaghetti_full.png", self.scale_factor)
+        self.rect = self.image.get_rect(center=self.rect.center)
+        self.dirty = 1
+
+    def _set_coordinates(self, coordinates):
+        self.rect.x = coordinates[0]
+        self.rect.y = coordinates[1]
+
+class Character(pygame.sprite.DirtySprite):
+    def __init__(self, character_id, state_id,  location, chopstick_1: Chopstick, chopstick_2: Chopstick,
+                 scale_factor=MULTIPLIER):
+        super().__init__()
+        self.image = load_image("assets/characters.png", scale_factor, horizontal_flip=state_id < 0,
+                                area=(abs(state_id)*16, character_id*16, 16, 16))
+        self.rect = self.image.get_rect(x=location[0], y = location[1])
+        self.direction = "right"
+        self.moving = False
+        self.speed = 5
+
+        self.meal = Meal(scale_factor=scale_factor / MULTIPLIER)
+        self.chopstick_1 = chopstick_1
+        self.chopstick_2 = chopstick_2
+
+    def get_meal(self):
+        return self.meal
+
+    def stop_process(self):
+        self.meal.reset()
+
+class Text:
+    def __init__(self, text, location, font_size=20, font_color=(0, 0, 0)):
+        self.text = text
+        self.font = pygame.font.Font(asset_path("assets/PressStart2P.ttf"), font_size)
+        self.text_surface = self.font.render(self.text, True, font_color)
+        self.text_rect = self.text_surface.get_rect(center=location)
+
+
+class StatsOverlay(pygame.sprite.DirtySprite):
+    REFRESH_INTERVAL = 500  # milliseconds
+
+    def __init__(self, location, font_size=8, font_color=(255, 255, 255), background_color=(0, 0, 0)):
+        super().__init__()
+        self.font = pygame.font.Font(asset_path("assets/PressStart2P.ttf"), font_size)
+        self.font_color = font_color
+        self.background_color = background_color
+        self.image = pygame.Surface((0, 0))
+        self.rect = self.image.get_rect(topleft=location)
+        self.last_refresh = 0
+        # Set when the simulation changed since the last rendering
+        self.stale = False
+
+    def due_in(self, instrumentation: Instrumentation):
+        """Milliseconds until the overlay has to be refreshed, None when it is up to date"""
+        if instrumentation is None or not self.stale:
+            return None
+        return max(0, self.last_refresh + self.REFRESH_INTERVAL - pygame.time.get_ticks())
+
+    def refresh(self, instrumentation: Instrumentation):
+        """Renders a snapshot of the instrumentation once stale, at most every REFRESH_INTERVAL"""
+        if self.due_in(instrumentation) != 0:
+            return
+        self.last_refresh = pygame.time.get_ticks()
+        self.stale = False
+        text = format_snapshot(instrumentation.snapshot())
+        self.image = self.font.render(text, True, self.font_color, self.background_color)
+        self.rect = self.image.get_rect(topleft=self.rect.topleft)
+        self.dirty = 1
+
+
+class Chopstick(pygame.sprite.DirtySprite):
+    def __init__(self, angle, location=(0, 0), image_name="assets/chopstick_up.png", scale_factor=1):
+        super().__init__()
+        self.sprites = {'free': load_image(image_name, scale_factor),
+                        'occupied': load_image("assets/empty.png", scale_factor)}
+        self.image = self.sprites['free']
+        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
+        # self.image = pygame.transform.rotate(self.image, angle)
+        self.angle = angle
+        self.rect = self.image.get_rect(center=location)
+
+    def occupy(self):
+        self.image = self.sprites['occupied']
+        self.dirty = 1
+        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
+        # self.image = pygame.transform.rotate(self.image, self.angle)
+
+    def free(self):
+        self.image = self.sprites['free']
+        self.dirty = 1
+        # self.image = pygame.transform.scale(self.image, (self.image.get_width()*0.3, self.image.get_height()*0.3))
+        # self.image = pygame.transform.rotate(self.image, self.angle)
+
+class ChangeNotifier:
+    """Posts STATE_CHANGED from the simulation threads, with at most one of them in the queue
+
+    The main loop calls taken() before it draws, the next change then posts a new one.
+    """
+    def __init__(self):
+        self.pending = threading.Event()
+
+    def changed(self):
+        if not self.pending.is_set():
+            self.pending.set()
+            pygame.event.post(pygame.event.Event(STATE_CHANGED))
+
+    def taken(self):
+        self.pending.clear()
+
+
+class SpriteObserver:
+    """Mirrors the events of a Simulation on the sprites, philosopher i holds chopstick i as chopstick_1"""
+    def __init__(self, philosophers: list, notifier: ChangeNotifier = None):
+        self.philosophers = philosophers
+        self.notifier = notifier
+
+    def __call__(self, event, philosopher, chopstick):
+        if event == Event.ACQUIRE:
+            self.philosophers[chopstick].chopstick_1.occupy()
+        elif event == Event.RELEASE:
+            self.philosophers[chopstick].chopstick_1.free()
+        elif event == Event.BITE:
+            self.philosophers[philosopher].get_meal().take_a_bite()
+        else:
+            return
+        if self.notifier is not None:
+            self.notifier.changed()
+
+    def restore(self, holders, meals):
+        """Shows the table as it is after a seek in a trace"""
+        for philosopher, holder, left_to_eat in zip(self.philosophers, holders, meals):
+            if holder == FREE:
+                philosopher.chopstick_1.free()
+            else:
+                philosopher.chopstick_1.occupy()
+            philosopher.get_meal().set_left_to_eat(left_to_eat)
+        if self.notifier is not None:
+            self.notifier.changed()
+
+class PhilosopherAddition(pygame.sprite.DirtySprite):
+    def __init__(self, location: tuple, type: ButtonState, number: PhiloshoperNumber):
+        super().__init__()
+        self.type = type
+        assert type in [ButtonState.ADDITION, ButtonState.SUBTRACTION]
+        if type == ButtonState.ADDITION:
+            self.image = load_image("assets/addition.png", 3)
+        elif type == ButtonState.SUBTRACTION:
+            self.image = load_image("assets/subtraction.png", 3)
+        self.rect = self.image.get_rect(center=location)
+        self.number = number
+
+    def change_number(self):
+        logger.info(f"{self.type} button pressed")
+        if self.type == ButtonState.ADDITION:
+            self.number.change_number(1)
+        elif self.type == ButtonState.SUBTRACTION:
+            self.number.change_number(-1)
+
+
+class StartGameButton(pygame.sprite.DirtySprite):
+    def __init__(self, location: tuple, replay_seed=None, speed=1.0, trace_path=None, record_path=None,
+                 log_sample=None, notifier: ChangeNotifier = None, timing_path=None):
+        super().__init__()
+        self.notifier = notifier
+        self.log_sample = log_sample
+        self.replay_seed = replay_seed
+        self.speed = speed
+        self.trace = TraceReader(trace_path) if trace_path is not None else None
+        # Same pace as before: a bite and a reach are a second at most, thinking takes 1 to 10 seconds
+        self.distributions = ((Uniform(1, 10), Uniform(0, 1), Uniform(0, 1)) if timing_path is None
+                              else load_distributions(timing_path))
+        self.record_path = record_path
+        self.trace_writer = None
+        self.games = 0
+        self.image = load_image("assets/start.png", 0.2)
+        self.rect = self.image.get_rect(center=location)
+        self.game_state = ButtonState.START
+        self.philosophers = []
+        self.simulation = None
+        self.instrumentation = None
+
+    def start_game(self, philosophers: list):
+        if self.game_state == ButtonState.START:
+            logger.info("Start game button pressed")
+            self.game_state = ButtonState.RESTART
+            self.image = load_image("assets/restart.png", 0.1)
+            self.rect = self.image.get_rect(topleft=self.rect.topleft)
+            self.dirty = 1
+            self.philosophers = philosophers
+
+            pace = timings(*self.distributions, seed=self.replay_seed)
+            if self.trace is not None:
+                logger.info(f"Replaying {len(self.trace)} events of {self.trace.duration / 1e9:.1f}s at x{self.speed}")
+                self.simulation = TraceReplay(self.trace, self.speed)
+            elif self.replay_seed is None:
+                self.simulation = Simulation(len(philosophers), meal_size=MEAL_SIZE, **pace)
+            else:
+                # The whole run is computed on a virtual clock first, then played back
+                events = record(len(philosophers), MEAL_SIZE, seed=self.replay_seed, **pace)
+                logger.info(f"Replaying {len(events)} events of seed {self.replay_seed} at x{self.speed}")
+                self.simulation = Replay(events, self.speed)
+            self.simulation.add_observer(SpriteObserver(philosophers, self.notifier))
+            self.instrumentation = Instrumentation(len(philosophers))
+            self.simulation.add_observer(self.instrumentation)
+            if self.log_sample is not None:
+                self.simulation.add_observer(EventLogger(sample=self.log_sample))
+            self.games += 1
+            if self.record_path is not None:
+                self.trace_writer = TraceWriter(game_path(self.record_path, self.games), len(philosophers), MEAL_SIZE)
+                self.simulation.add_observer(self.trace_writer)
+            self.simulation.start()
+
+    def restart_game(self):
+        if self.game_state != ButtonState.RESTART:
+            return
+        logger.info("Restart game button pressed")
+        self.game_state = ButtonState.START
+        self.image = load_image("assets/start.png", 0.2)
+        self.rect = self.image.get_rect(topleft=self.rect.topleft)
+        self.dirty = 1
+        if self.simulation is not None:
+            self.simulation.stop()
+            self.simulation.join(STOP_TIMEOUT)
+            leaked = self.simulation.alive_threads()
+            if leaked:
+                logger.warning(f"{leaked} threads of the previous game are still running")
+            self.simulation = None
+            if self.trace_writer is not None:
+                self.trace_writer.close()
+                logger.info(f"Trace written to {game_path(self.record_path, self.games)}")
+                self.trace_writer = None
+            self.philosophers = []
+        else:
+            logger.error("No philosophers to restart")
+
+    def get_game_state(self):
+        return self.game_state
+
+    def scrub(self, direction):
+        """Moves a trace replay by a twentieth of the trace, direction is 1 or -1"""
+        if isinstance(self.simulation, TraceReplay):
+            self.simulation.seek(self.simulation.position + direction * self.trace.duration // 20)
+
+    def change_speed(self, factor):
+        if isinstance(self.simulation, TraceReplay):
+            self.speed *= factor
+            self.simulation.set_speed(self.speed)
+            logger.info(f"Replay speed x{self.speed:g}")
@@ -0,0 +1,117 @@
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+from threading import Lock
+import time
+import weakref
+
+FREE = -1
+
+TableSnapshot = namedtuple("TableSnapshot", ["states", "held", "holders", "meals"])
+
+
+class TableState:
+    """State of every philosopher and chopstick in typed arrays, guarded by a sequence counter
+
+    states and held take one byte per philosopher, meals left and chopstick holders four.
+    Writers bump the sequence to an odd value, write, and bump it back to even; the short write
+    lock only serializes writers. Readers never lock: snapshot() copies the arrays and retries
+    until the sequence was even and unchanged around the copy, so a snapshot is never torn.
+    """
+
+    def __init__(self, number_of_philosophers, meal_size):
+        n = number_of_philosophers
+        self.states = array('b', bytes(n))
+        self.held = array('b', bytes(n))
+        self.holders = array('i', [FREE]) * n
+        self.meals = array('i', [meal_size]) * n
+        self.sequence = 0
+        self.write_lock = Lock()
+
+    def set_state(self, i, state):
+        with self.write_lock:
+            self.sequence += 1
+            self.states[i] = state
+            self.sequence += 1
+
+    def acquired(self, i, chopstick):
+        with self.write_lock:
+            self.sequence += 1
+            self.held[i] += 1
+            self.holders[chopstick] = i
+            self.sequence += 1
+
+    def released(self, i, chopstick):
+        with self.write_lock:
+            self.sequence += 1
+            self.held[i] -= 1
+            self.holders[chopstick] = FREE
+            self.sequence += 1
+
+    def bite(self, i):
+        with self.write_lock:
+            self.sequence += 1
+            self.meals[i] -= 1
+            self.sequence += 1
+
+    @staticmethod
+    def copy(values):
+        return values[:]
+
+    def snapshot(self):
+        while True:
+            sequence = self.sequence
+            if sequence & 1:
+                # A writer is in the middle of an update, let it finish
+                time.sleep(0)
+                continue
+            snapshot = TableSnapshot(self.copy(self.states), self.copy(self.held), self.copy(self.holders),
+                                     self.copy(self.meals))
+            if self.sequence == sequence:
+                return snapshot
+
+
+def _release(memory, views):
+    for view in views:
+        view.release()
+    memory.close()
+    memory.unlink()
+
+
+class SharedTableState(TableState):
+    """TableState whose arrays and sequence counter live in one shared memory block
+
+    The views over the block are inherited by forked processes, so workers write the state in
+    place and the parent reads it without copying it through a pipe. write_lock must be a
+    multiprocessing lock shared by the writers. The block is unlinked when the table is collected.
+    """
+
+    def __init__(self, number_of_philosophers, meal_size, write_lock):
+        n = number_of_philosophers
+        # Sequence, then states and held, then holders and meals aligned on four bytes
+        holders_offset = 8 + (2 * n + 3) // 4 * 4
+        meals_offset = holders_offset + 4 * n
+        self.memory = shared_memory.SharedMemory(create=True, size=meals_offset + 4 * n)
+        buffer = self.memory.buf
+        self.header = buffer[:8].cast('q')
+        self.states = buffer[8:8 + n].cast('b')
+        self.held = buffer[8 + n:8 + 2 * n].cast('b')
+        self.holders = buffer[holders_offset:meals_offset].cast('i')
+        self.meals = buffer[meals_offset:meals_offset + 4 * n].cast('i')
+        self.holders[:] = array('i', [FREE]) * n
+        self.meals[:] = array('i', [meal_size]) * n
+        self.write_lock = write_lock
+        views = (self.header, self.states, self.held, self.holders, self.meals, buffer)
+        weakref.finalize(self, _release, self.memory, views)
+
+    @property
+    def sequence(self):
+        return self.header[0]
+
+    @sequence.setter
+    def sequence(self, value):
+        self.header[0] = value
+
+    @staticmethod
+    def copy(values):
+        return array(values.format, values.tobytes())
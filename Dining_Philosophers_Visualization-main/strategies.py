@@ -0,0 +1,328 @@
+from threading import Condition, Lock
+import time
+from async_backend import AsyncSimulation
+from handoff import HandoffLock
+from process_backend import ProcessSimulation
+from simulation import Event, Simulation
+import w_lock
+import w_semaphore
+
+
+class ResourceOrdering(Simulation):
+    """Every philosopher waits for the lower numbered chopstick first, which breaks the circular wait"""
+
+    blocking = True
+
+    def new_chopstick(self):
+        return self.semaphore()
+
+    def pick_up(self, i, chopstick):
+        return self.wait_for(self.chopsticks[chopstick])
+
+    def acquire(self, i, left, right):
+        first, second = min(left, right), max(left, right)
+        if not self.take(i, first):
+            return False
+        if self.pause(self.reach_times[i]()) or not self.take(i, second):
+            self.give_back(i, first)
+            return False
+        return True
+
+
+class Footman(Simulation):
+    """At most n - 1 philosophers may try to eat at the same time, so one of them always gets both chopsticks"""
+
+    blocking = True
+
+    def __init__(self, number_of_philosophers, *args, **kwargs):
+        super().__init__(number_of_philosophers, *args, **kwargs)
+        self.footman = self.semaphore(max(1, number_of_philosophers - 1))
+
+    def new_chopstick(self):
+        return self.semaphore()
+
+    def pick_up(self, i, chopstick):
+        return self.wait_for(self.chopsticks[chopstick])
+
+    def acquire(self, i, left, right):
+        if not self.wait_for(self.footman):
+            return False
+        if self.take(i, left):
+            if not self.pause(self.reach_times[i]()) and self.take(i, right):
+                return True
+            self.give_back(i, left)
+        self.footman.release()
+        return False
+
+    def release(self, i, left, right):
+        super().release(i, left, right)
+        self.footman.release()
+
+
+class Waiter(Simulation):
+    """A waiter hands out both chopsticks at once, only when both are free"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiter = Condition()
+
+    def acquire(self, i, left, right):
+        with self.waiter:
+            while self.chopsticks[left].locked() or self.chopsticks[right].locked():
+                if self.stopping.is_set():
+                    return False
+                self.waiter.wait()
+            self.take(i, left)
+            self.take(i, right)
+        return True
+
+    def release(self, i, left, right):
+        with self.waiter:
+            super().release(i, left, right)
+            self.waiter.notify_all()
+
+    def stop(self):
+        super().stop()
+        with self.waiter:
+            self.waiter.notify_all()
+
+
+class ChandyMisra(Simulation):
+    """Chandy/Misra clean and dirty chopsticks
+
+    Each chopstick has an owner and is dirty once it has been eaten with. A dirty chopstick goes
+    to the hungry neighbour as soon as its owner is not eating, a clean one is kept until used.
+    The chopsticks start dirty at the lower numbered neighbour, so the precedence graph is acyclic.
+    """
+
+    def __init__(self, number_of_philosophers, *args, **kwargs):
+        super().__init__(number_of_philosophers, *args, **kwargs)
+        n = number_of_philosophers
+        self.fork_condition = Condition()
+        # Chopstick c is shared by philosophers c - 1 and c
+        self.owners = [min((c - 1) % n, c) for c in range(n)]
+        self.dirty = [True for _ in range(n)]
+        self.hungry = [False for _ in range(n)]
+        self.eating = [False for _ in range(n)]
+
+    def new_chopstick(self):
+        return None
+
+    def pick_up(self, i, chopstick):
+        return self.owners[chopstick] == i
+
+    def put_down(self, i, chopstick):
+        pass
+
+    def neighbour(self, i, chopstick):
+        n = self.number_of_philosophers
+        return (chopstick - 1) % n if chopstick == i else chopstick
+
+    def acquire(self, i, left, right):
+        with self.fork_condition:
+            self.hungry[i] = True
+            while True:
+                for chopstick in (left, right):
+                    owner = self.owners[chopstick]
+                    other = self.neighbour(i, chopstick)
+                    if owner != i and self.dirty[chopstick] and not self.eating[owner]:
+                        self.owners[chopstick] = i
+                        self.dirty[chopstick] = False
+                    elif owner == i and self.dirty[chopstick] and self.hungry[other] and other != i:
+                        self.owners[chopstick] = other
+                        self.dirty[chopstick] = False
+                        self.fork_condition.notify_all()
+                if self.owners[left] == i and self.owners[right] == i:
+                    break
+                if self.stopping.is_set():
+                    self.hungry[i] = False
+                    return False
+                self.fork_condition.wait()
+            self.hungry[i] = False
+            self.eating[i] = True
+            self.take(i, left)
+            self.take(i, right)
+        return True
+
+    def release(self, i, left, right):
+        with self.fork_condition:
+            super().release(i, left, right)
+            self.eating[i] = False
+            self.dirty[left] = True
+            self.dirty[right] = True
+            self.fork_condition.notify_all()
+
+    def stop(self):
+        super().stop()
+        with self.fork_condition:
+            self.fork_condition.notify_all()
+
+
+class Handoff(Simulation):
+    """Chopsticks with a waiter queue, a released chopstick goes straight to the hungry neighbour
+
+    A philosopher starts with the left chopstick and only tries the other one. When it is busy,
+    the first chopstick is put back and the philosopher queues for the busy one instead of going
+    back to think. Nobody waits while holding a chopstick, so the waits cannot form a cycle.
+    With fairness "priority" the philosopher who has eaten the fewest bites is served first.
+    """
+
+    blocking = True
+    fairness = "fifo"
+
+    def new_chopstick(self):
+        return HandoffLock(self.fairness)
+
+    def pick_up(self, i, chopstick):
+        return self.chopsticks[chopstick].acquire(priority=-self.meals[i], interrupt=self.stopping)
+
+    def stop(self):
+        super().stop()
+        for chopstick in self.chopsticks:
+            chopstick.wake()
+
+    def try_take(self, i, chopstick):
+        if not self.chopsticks[chopstick].acquire(blocking=False):
+            self.notify(Event.ACQUIRE_FAILED, i, chopstick)
+            return False
+        self.table.acquired(i, chopstick)
+        self.notify(Event.ACQUIRE, i, chopstick)
+        return True
+
+    def acquire(self, i, left, right):
+        wanted, other = left, right
+        while self.take(i, wanted):
+            if self.pause(self.reach_times[i]()):
+                self.give_back(i, wanted)
+                return False
+            if self.try_take(i, other):
+                return True
+            # Never wait while holding a chopstick: queue for the busy one instead
+            self.give_back(i, wanted)
+            wanted, other = other, wanted
+        return False
+
+
+class PriorityHandoff(Handoff):
+    fairness = "priority"
+
+
+STRATEGIES = {
+    "check_locked": w_lock.DiningPhilosophers,
+    "timeout": w_semaphore.DiningPhilosophers,
+    "ordered": ResourceOrdering,
+    "waiter": Waiter,
+    "footman": Footman,
+    "chandy_misra": ChandyMisra,
+    "handoff": Handoff,
+    "handoff_priority": PriorityHandoff,
+    "asyncio": AsyncSimulation,
+    "processes": ProcessSimulation,
+}
+
+
+def create(strategy, number_of_philosophers, meal_size=9, **timings):
+    """Returns the simulation of the strategy registered under the given name"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}, expected one of {', '.join(STRATEGIES)}")
+    return STRATEGIES[strategy](number_of_philosophers, meal_size, **timings)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list, q between 0 and 1"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Metrics:
+    """Observer measuring meals per second, hungry to eating waits and chopstick idle time"""
+
+    def __init__(self, simulation):
+        n = simulation.number_of_philosophers
+        self.number_of_philosophers = n
+        self.hungry_since = [None for _ in range(n)]
+        self.held_since = [None for _ in range(n)]
+        self.held_total = [0.0 for _ in range(n)]
+        self.waits = [[] for _ in range(n)]
+        self.bites = 0
+        self.started = None
+        self.stopped = None
+        self.lock = Lock()
+        simulation.add_observer(self)
+
+    def __call__(self, event, philosopher, chopstick):
+        now = time.monotonic()
+        if event == Event.HUNGRY:
+            if self.hungry_since[philosopher] is None:
+                self.hungry_since[philosopher] = now
+        elif event == Event.EAT:
+            self.waits[philosopher].append(now - self.hungry_since[philosopher])
+            self.hungry_since[philosopher] = None
+        elif event == Event.ACQUIRE:
+            self.held_since[chopstick] = now
+        elif event == Event.RELEASE:
+            self.held_total[chopstick] += now - self.held_since[chopstick]
+        elif event == Event.BITE:
+            with self.lock:
+                self.bites += 1
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def stop(self):
+        self.stopped = time.monotonic()
+
+    def report(self):
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        waits = sorted(wait for philosopher_waits in self.waits for wait in philosopher_waits)
+        return {
+            "meals_per_second": self.bites / elapsed if elapsed > 0 else 0.0,
+            "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+            "p99_wait": percentile(waits, 0.99),
+            "max_wait": waits[-1] if waits else 0.0,
+            "fork_idle": 1 - sum(self.held_total) / (elapsed * self.number_of_philosophers) if elapsed > 0 else 0.0,
+        }
+
+
+def measure(strategy, number_of_philosophers, meal_size=9, **timings):
+    """Runs the strategy to completion and returns its Metrics report"""
+    simulation = create(strategy, number_of_philosophers, meal_size, **timings)
+    metrics = Metrics(simulation)
+    metrics.start()
+    simulation.run()
+    metrics.stop()
+    return metrics.report()
+
+
+def compare(number_of_philosophers, meal_size=9, eat_time=0.01, think_ratio=1.0, strategies=None):
+    """Measures every strategy with fixed eat times and think times of think_ratio * eat_time"""
+    think_time = eat_time * think_ratio
+    reports = {}
+    for strategy in strategies or STRATEGIES:
+        reports[strategy] = measure(strategy, number_of_philosophers, meal_size,
+                                    think_time=lambda: think_time,
+                                    eat_time=lambda: eat_time,
+                                    reach_time=lambda: eat_time / 10)
+    return reports
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Compares the chopstick acquisition strategies")
+    parser.add_argument("-n", "--philosophers", type=int, default=5)
+    parser.add_argument("-m", "--meals", type=int, default=20)
+    parser.add_argument("--eat-time", type=float, default=0.01, help="seconds")
+    parser.add_argument("--think-ratio", type=float, default=1.0, help="think time / eat time")
+    parser.add_argument("strategies", nargs="*", help=f"any of {', '.join(STRATEGIES)}, all by default")
+    arguments = parser.parse_args()
+    reports = compare(arguments.philosophers, arguments.meals, arguments.eat_time, arguments.think_ratio,
+                      arguments.strategies)
+    print(f"{'strategy':<18}{'meals/s':>10}{'mean wait':>12}{'p99 wait':>12}{'fork idle':>12}")
+    for strategy, report in sorted(reports.items(), key=lambda item: -item[1]["meals_per_second"]):
+        print(f"{strategy:<18}{report['meals_per_second']:>10.1f}{report['mean_wait'] * 1000:>10.1f}ms"
+              f"{report['p99_wait'] * 1000:>10.1f}ms{report['fork_idle']:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
+import argparse
+import csv
+import json
+import os
+import sys
+from benchmark import CONFIG_KEYS, run_configuration as run_benchmark
+from strategies import STRATEGIES
+
+# Parameters of a configuration, in grid and output column order
+SWEEP_KEYS = ("backend", "philosophers", "meal_size", "think_scale", "eat_scale", "reach_scale", "seed",
+              "timing_trace")
+# Parameters whose values are strings, the others are numbers
+TEXT_KEYS = ("backend", "timing_trace")
+# Values of the parameters a grid leaves out
+DEFAULT_GRID = {
+    "backend": ["check_locked", "timeout"],
+    "philosophers": [5, 10],
+    "meal_size": [5],
+    "think_scale": [0.01],
+    "eat_scale": [0.01],
+    "reach_scale": [0.001],
+    "seed": [0],
+    "timing_trace": [None],
+}
+
+
+def run_configuration(configuration):
+    """Runs one configuration of the grid, given as a dict of SWEEP_KEYS, and returns its row
+
+    It is measured by benchmark.run_configuration, the row holds the parameters of the grid then
+    the same measurements as a benchmark result.
+    Think, eat and reach times are uniform between 0 and their scale in seconds, drawn from
+    per-philosopher streams seeded with the seed of the configuration. With a timing_trace, they
+    are the durations recorded in that trace instead and the scales are left unused.
+    """
+    measurements = run_benchmark(configuration["backend"], configuration["philosophers"], configuration["meal_size"],
+                                 None, configuration["seed"], configuration["timing_trace"],
+                                 configuration["think_scale"], configuration["eat_scale"], configuration["reach_scale"])
+    result = {key: configuration[key] for key in SWEEP_KEYS}
+    result.update((key, value) for key, value in measurements.items() if key not in CONFIG_KEYS)
+    return result
+
+
+def expand(grid):
+    """Every configuration of a grid mapping parameters to lists of values, in a stable order"""
+    unknown = set(grid) - set(SWEEP_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {', '.join(sorted(unknown))}, expected {', '.join(SWEEP_KEYS)}")
+    grid = {**DEFAULT_GRID, **grid}
+    for backend in grid["backend"]:
+        if backend not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {backend}, expected one of {', '.join(STRATEGIES)}")
+    values = [value if isinstance(value, list) else [value] for value in (grid[key] for key in SWEEP_KEYS)]
+    return [dict(zip(SWEEP_KEYS, combination)) for combination in product(*values)]
+
+
+def configuration_key(row):
+    """Identifies a configuration the same way whether it was read back from csv or json, 1 and 1.0 alike
+
+    A missing text value, an empty csv cell or a json null, is None.
+    """
+    return tuple((row.get(key) or None) if key in TEXT_KEYS else float(row[key]) for key in SWEEP_KEYS)
+
+
+class ResultFile:
+    """Results appended one row at a time to a json-lines file, or to a csv file for a .csv path
+
+    Rows already in the file are read back on opening, done() tells which configurations they
+    cover. A last row cut short by an interruption is dropped so the file stays well formed.
+    Nested values, such as the per-philosopher percentiles, are json-encoded in csv cells.
+    """
+
+    def __init__(self, path):
+        self.csv = path.endswith(".csv")
+        self.completed = set()
+        self.fieldnames = None
+        if os.path.exists(path):
+            self.truncate_partial_row(path)
+            with open(path, newline="") as existing:
+                rows = csv.DictReader(existing) if self.csv else (json.loads(line) for line in existing if line.strip())
+                for row in rows:
+                    self.completed.add(configuration_key(row))
+                if self.csv:
+                    self.fieldnames = rows.fieldnames
+        self.file = open(path, "a", newline="")
+        self.writer = None
+
+    @staticmethod
+    def truncate_partial_row(path):
+        with open(path, "rb+") as existing:
+            content = existing.read()
+            if content and not content.endswith(b"\n"):
+                existing.truncate(content.rfind(b"\n") + 1)
+
+    def done(self, configuration):
+        return configuration_key(configuration) in self.completed
+
+    def write(self, result):
+        if self.csv:
+            if self.writer is None:
+                self.fieldnames = self.fieldnames or list(result)
+                self.writer = csv.DictWriter(self.file, self.fieldnames, extrasaction="ignore")
+                if self.file.tell() == 0:
+                    self.writer.writeheader()
+            self.writer.writerow({key: json.dumps(value) if isinstance(value, (list, dict)) else value
+                                  for key, value in result.items()})
+        else:
+            self.file.write(json.dumps(result) + "\n")
+        # Flushed at every row so an interruption only loses the runs in progress
+        self.file.flush()
+        self.completed.add(configuration_key(result))
+
+    def close(self):
+        self.file.close()
+
+
+def run_sweep(grid, path, workers=None):
+    """Runs the configurations of the grid missing from path over a pool of workers processes
+
+    Each result is appended to path as soon as its run finishes, in completion order. Every run
+    gets a fresh worker process, so its CPU time and peak RSS are its own. A failed run is
+    reported and left out of the file, so the next sweep tries it again.
+    Returns the number of configurations run and the number that failed.
+    """
+    results = ResultFile(path)
+    pending = [configuration for configuration in expand(grid) if not results.done(configuration)]
+    workers = workers or os.cpu_count() or 1
+    failures = 0
+    print(f"{len(pending)} configurations to run on {workers} workers, "
+          f"{len(results.completed)} already in {path}", file=sys.stderr)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+            running = {executor.submit(run_configuration, configuration): configuration
+                       for configuration in pending}
+            try:
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        configuration = running.pop(future)
+                        name = " ".join(f"{key}={configuration[key]}" for key in SWEEP_KEYS)
+                        try:
+                            result = future.result()
+                        except Exception as error:
+                            failures += 1
+                            print(f"{name}: failed, {error!r}", file=sys.stderr)
+                            continue
+                        results.write(result)
+                        print(f"{name}: {result['meals_per_second']:.1f} meals/s", file=sys.stderr)
+            except KeyboardInterrupt:
+                # Only the runs in progress are waited for, the queued ones are left to the next sweep
+                executor.shutdown(cancel_futures=True)
+                raise
+    finally:
+        results.close()
+    return len(pending), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a grid of configurations over a process pool")
+    parser.add_argument("-o", "--output", default="sweep.jsonl", help="a .jsonl or .csv file, resumed if it exists")
+    parser.add_argument("--grid", help="json file mapping parameters to lists of values, the defaults fill the rest")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes, one per core by default")
+    for key in SWEEP_KEYS:
+        kind = str if key in TEXT_KEYS else int if key in ("philosophers", "meal_size", "seed") else float
+        parser.add_argument("--" + key.replace("_", "-"), nargs="+", type=kind, default=None,
+                            help=f"overrides the grid, default {' '.join(map(str, DEFAULT_GRID[key]))}")
+    arguments = parser.parse_args()
+
+    grid = {}
+    if arguments.grid:
+        with open(arguments.grid) as grid_file:
+            grid = json.load(grid_file)
+    for key in SWEEP_KEYS:
+        if getattr(arguments, key) is not None:
+            grid[key] = getattr(arguments, key)
+    try:
+        _, failures = run_sweep(grid, arguments.output, arguments.workers)
+    except KeyboardInterrupt:
+        print(f"Interrupted, run the same sweep again to resume it from {arguments.output}", file=sys.stderr)
+        return 130
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+from threading import Lock
+import time
+from simulation import Event
+from state import FREE
+
+# Categories of the timeline rows, in drawing and legend order
+THINKING, HUNGRY, HOLDING, EATING, HELD = range(5)
+CATEGORY_NAMES = ("thinking", "hungry", "holding one", "eating", "chopstick held")
+CATEGORY_COLORS = ("#d8d8d8", "#f0a030", "#c060c0", "#30a050", "#5070d0")
+
+ROW_HEIGHT = 10
+ROW_GAP = 2
+LABEL_WIDTH = 40
+LEGEND_HEIGHT = 20
+# Digits kept in the header for the width, written with leading zeros when the timeline is closed
+WIDTH_DIGITS = 9
+
+
+class _Row:
+    """Pixel columns of one row, a column is drawn with the category that filled most of it"""
+
+    def __init__(self):
+        self.column = None
+        self.weights = [0.0] * len(CATEGORY_NAMES)
+        self.run_category = None
+        self.run_start = 0
+        self.run_end = 0
+
+
+class Timeline:
+    """Streams rows of intervals to an SVG or self-contained HTML file in constant memory
+
+    Intervals are given in nanoseconds and drawn at nanoseconds_per_pixel. Each row only keeps the
+    pixel column being filled and the run of columns of the same category before it: a column is
+    drawn with the category that covers most of it, and consecutive columns of the same category
+    become one rectangle. A row then has at most one rectangle per pixel whatever the length of
+    the run, and the file is written as the intervals arrive.
+    """
+
+    def __init__(self, path, labels, nanoseconds_per_pixel, origin=0):
+        self.html = path.endswith(".html")
+        self.file = open(path, "w")
+        self.labels = labels
+        self.nanoseconds_per_pixel = nanoseconds_per_pixel
+        self.origin = origin
+        self.rows = [_Row() for _ in labels]
+        self.right = 0
+        self.height = LEGEND_HEIGHT + len(labels) * (ROW_HEIGHT + ROW_GAP)
+        if self.html:
+            self.file.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Dining philosophers timeline"
+                            "</title></head><body>\n")
+        self.file.write('<svg xmlns="http://www.w3.org/2000/svg" width="')
+        self.width_offset = self.file.tell()
+        self.file.write(f'{"0" * WIDTH_DIGITS}" height="{self.height}" font-family="monospace" font-size="9">\n')
+        x = LABEL_WIDTH
+        for category, name in enumerate(CATEGORY_NAMES):
+            self.file.write(f'<rect fill="{CATEGORY_COLORS[category]}" x="{x}" y="4" width="10" height="10"/>'
+                            f'<text x="{x + 14}" y="13">{name}</text>\n')
+            x += 14 + 7 * len(name) + 12
+        for row, label in enumerate(labels):
+            self.file.write(f'<text x="2" y="{self.y(row) + ROW_HEIGHT - 1}">{label}</text>\n')
+
+    def y(self, row):
+        return LEGEND_HEIGHT + row * (ROW_HEIGHT + ROW_GAP)
+
+    def add(self, row, category, start, end):
+        """Adds an interval, the intervals of a row must come in time order"""
+        x0 = (start - self.origin) / self.nanoseconds_per_pixel
+        x1 = (end - self.origin) / self.nanoseconds_per_pixel
+        state = self.rows[row]
+        while x0 < x1:
+            column = int(x0)
+            if column != state.column:
+                self.finish_column(row, state)
+                state.column = column
+            if x1 >= column + 1 and x0 == column:
+                # Whole columns of one category go straight to the run
+                columns = int(x1) - column
+                self.extend_run(row, state, category, column, column + columns)
+                state.column = None
+                x0 = column + columns
+                continue
+            end_of_column = min(x1, column + 1)
+            state.weights[category] += end_of_column - x0
+            x0 = end_of_column
+
+    def finish_column(self, row, state):
+        if state.column is None:
+            return
+        weights = state.weights
+        total = sum(weights)
+        if total > 0:
+            category = max(range(len(weights)), key=weights.__getitem__)
+            self.extend_run(row, state, category, state.column, state.column + 1)
+        state.weights = [0.0] * len(weights)
+        state.column = None
+
+    def extend_run(self, row, state, category, start, end):
+        if state.run_category == category and state.run_end == start:
+            state.run_end = end
+            return
+        self.write_run(row, state)
+        state.run_category, state.run_start, state.run_end = category, start, end
+
+    def write_run(self, row, state):
+        if state.run_category is None:
+            return
+        self.file.write(f'<rect fill="{CATEGORY_COLORS[state.run_category]}" x="{LABEL_WIDTH + state.run_start}" '
+                        f'y="{self.y(row)}" width="{state.run_end - state.run_start}" height="{ROW_HEIGHT}"/>\n')
+        self.right = max(self.right, state.run_end)
+        state.run_category = None
+
+    def close(self):
+        for row, state in enumerate(self.rows):
+            self.finish_column(row, state)
+            self.write_run(row, state)
+        self.file.write("</svg>\n")
+        if self.html:
+            self.file.write("</body></html>\n")
+        self.file.seek(self.width_offset)
+        self.file.write(str(LABEL_WIDTH + self.right + 10).zfill(WIDTH_DIGITS))
+        self.file.close()
+
+
+class TimelineRecorder:
+    """Observer turning the events into timeline intervals, one row per philosopher then per chopstick
+
+    A philosopher row shows thinking, hungry, hungry with one chopstick and eating, a chopstick row
+    shows when the chopstick is held, the gaps are the times it sat idle. It is fed live by a
+    simulation, with clock giving nanoseconds, or by the records of a trace with feed(). Live, the
+    timeline starts at the clock reading of the first event, so it fits the clock whatever its epoch.
+    """
+
+    def __init__(self, timeline, number_of_philosophers, clock=time.monotonic_ns):
+        n = number_of_philosophers
+        self.timeline = timeline
+        self.number_of_philosophers = n
+        self.clock = clock
+        self.categories = [None] * n
+        self.since = [0] * n
+        self.held = [0] * n
+        self.held_since = [0] * n
+        self.holders = [FREE] * n
+        self.started = False
+        self.lock = Lock()
+
+    def __call__(self, event, philosopher, chopstick):
+        with self.lock:
+            now = self.clock()
+            if not self.started:
+                self.started = True
+                self.timeline.origin = now
+            self.feed(now, event, philosopher, chopstick)
+
+    def feed(self, now, event, philosopher, chopstick):
+        if event == Event.ACQUIRE:
+            self.held[philosopher] += 1
+            self.holders[chopstick] = philosopher
+            self.held_since[chopstick] = now
+        elif event == Event.RELEASE:
+            self.held[philosopher] -= 1
+            if self.holders[chopstick] == philosopher:
+                self.holders[chopstick] = FREE
+                self.timeline.add(self.number_of_philosophers + chopstick, HELD, self.held_since[chopstick], now)
+        category = self.categories[philosopher]
+        if event == Event.THINK:
+            category = THINKING
+        elif event == Event.HUNGRY or event == Event.ACQUIRE or event == Event.ACQUIRE_FAILED or event == Event.RELEASE:
+            if category != EATING:
+                category = HOLDING if self.held[philosopher] else HUNGRY
+        elif event == Event.EAT:
+            category = EATING
+        elif event == Event.FINISH:
+            category = None
+        self.switch(philosopher, category, now)
+
+    def switch(self, philosopher, category, now):
+        previous = self.categories[philosopher]
+        if category == previous:
+            return
+        if previous is not None:
+            self.timeline.add(philosopher, previous, self.since[philosopher], now)
+        self.categories[philosopher] = category
+        self.since[philosopher] = now
+
+    def close(self, now=None):
+        """Ends the open intervals at now and closes the timeline"""
+        now = self.clock() if now is None else now
+        with self.lock:
+            for philosopher in range(self.number_of_philosophers):
+                self.switch(philosopher, None, now)
+            for chopstick, holder in enumerate(self.holders):
+                if holder != FREE:
+                    self.timeline.add(self.number_of_philosophers + chopstick, HELD, self.held_since[chopstick], now)
+            self.timeline.close()
+
+
+def labels(number_of_philosophers):
+    return [f"P{i}" for i in range(number_of_philosophers)] + [f"C{c}" for c in range(number_of_philosophers)]
+
+
+def export_trace(trace_path, output_path, width=2000):
+    """Streams a binary trace into a timeline width pixels wide"""
+    from tracefile import TraceReader
+    reader = TraceReader(trace_path)
+    n = reader.number_of_philosophers
+    timeline = Timeline(output_path, labels(n), max(1, reader.duration) / width)
+    recorder = TimelineRecorder(timeline, n)
+    for timestamp, event, philosopher, chopstick in reader.records():
+        recorder.feed(timestamp, event, philosopher, chopstick)
+    recorder.close(reader.duration)
+    reader.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Exports a binary trace as an SVG or HTML timeline")
+    parser.add_argument("trace")
+    parser.add_argument("output", help="a .svg or .html file")
+    parser.add_argument("--width", type=int, default=2000, help="pixels for the whole run")
+    arguments = parser.parse_args()
+    export_trace(arguments.trace, arguments.output, arguments.width)
+
+
+if __name__ == "__main__":
+    main()
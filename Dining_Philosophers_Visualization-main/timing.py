@@ -0,0 +1,267 @@
+from abc import ABC, abstractmethod
+from array import array
+from itertools import chain, cycle, islice
+from threading import local
+import math
+import os
+import random
+from simulation import Event
+from tracefile import TraceReader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Durations sampled at once for a philosopher, each stream keeps a buffer of BATCH_SIZE * 8 bytes
+BATCH_SIZE = 256
+
+# Generator of each thread, moved by Source.batch() to the batch of the stream being filled
+_threads = local()
+
+
+def seed_key(seed):
+    """Integer key of a seed, None draws a fresh key for every stream"""
+    if seed is None or numpy is None:
+        return seed
+    return int(numpy.random.SeedSequence(seed).generate_state(1, numpy.uint64)[0])
+
+
+class Source:
+    """Random numbers of one philosopher, reproducible from the key and independent of the others
+
+    A source only keeps its key and the number of batches drawn. batch() moves the generator of the
+    thread to the start of the next batch, a counter-based Philox generator keyed by the seed,
+    stream and philosopher when NumPy is installed, otherwise a random.Random seeded with them.
+    A stream then takes a few bytes on top of its buffer, even on a table of 100k philosophers.
+    """
+
+    def __init__(self, key, stream, philosopher):
+        self.key = int.from_bytes(os.urandom(8), "little") if key is None else key
+        self.stream = stream
+        self.philosopher = philosopher
+        self.batches = 0
+
+    def batch(self):
+        """Generator at the start of the next batch, valid until the thread asks for another batch"""
+        generator = getattr(_threads, "generator", None)
+        if numpy is None:
+            if generator is None:
+                generator = _threads.generator = random.Random()
+            generator.seed(f"{self.key}/{self.stream}/{self.philosopher}/{self.batches}")
+        else:
+            if generator is None:
+                generator = _threads.generator = numpy.random.Generator(numpy.random.Philox(key=0))
+                # The state of a fresh generator, its arrays are rewritten for every batch
+                _threads.state = generator.bit_generator.state
+            state = _threads.state
+            # A batch draws far fewer than 2 ** 64 blocks from counter[0], so the batches never overlap
+            state["state"]["counter"][1] = self.batches
+            key = state["state"]["key"]
+            key[0] = self.key
+            key[1] = self.stream << 32 | self.philosopher
+            generator.bit_generator.state = state
+        self.batches += 1
+        return generator
+
+
+class Distribution(ABC):
+    """Durations in seconds, fill() writes a batch of them into a preallocated buffer
+
+    The buffer is a NumPy array and source.batch() a NumPy generator when NumPy is installed,
+    otherwise an array of doubles and a random.Random, filled one value at a time. Either way the
+    buffer is written in place and keeps its length.
+    """
+
+    def source(self, key, stream, philosopher):
+        return Source(key, stream, philosopher)
+
+    @abstractmethod
+    def fill(self, buffer, source):
+        pass
+
+
+class Fixed(Distribution):
+    def __init__(self, value):
+        self.value = value
+
+    def fill(self, buffer, source):
+        if numpy is None:
+            for k in range(len(buffer)):
+                buffer[k] = self.value
+            return
+        buffer.fill(self.value)
+
+
+class Uniform(Distribution):
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def fill(self, buffer, source):
+        generator = source.batch()
+        if numpy is None:
+            for k in range(len(buffer)):
+                buffer[k] = generator.uniform(self.low, self.high)
+            return
+        generator.random(out=buffer)
+        buffer *= self.high - self.low
+        buffer += self.low
+
+
+class Exponential(Distribution):
+    def __init__(self, mean):
+        self.mean = mean
+
+    def fill(self, buffer, source):
+        generator = source.batch()
+        if numpy is None:
+            for k in range(len(buffer)):
+                buffer[k] = generator.expovariate(1 / self.mean)
+            return
+        generator.standard_exponential(out=buffer)
+        buffer *= self.mean
+
+
+class LogNormal(Distribution):
+    """Durations whose logarithm is normal, median times exp(sigma * a standard normal)"""
+
+    def __init__(self, median, sigma):
+        self.median = median
+        self.sigma = sigma
+
+    def fill(self, buffer, source):
+        generator = source.batch()
+        if numpy is None:
+            for k in range(len(buffer)):
+                buffer[k] = generator.lognormvariate(math.log(self.median), self.sigma)
+            return
+        generator.standard_normal(out=buffer)
+        buffer *= self.sigma
+        numpy.exp(buffer, out=buffer)
+        buffer *= self.median
+
+
+class Replay(Distribution):
+    """Durations of a recording played in order and over again, one list per philosopher
+
+    A table larger than the recording reuses the lists, philosopher i gets list i % len(durations).
+    """
+
+    def __init__(self, durations):
+        if not any(durations):
+            raise ValueError("No durations to replay")
+        self.durations = durations
+
+    def source(self, key, stream, philosopher):
+        return cycle(self.durations[philosopher % len(self.durations)])
+
+    def fill(self, buffer, source):
+        buffer[:] = array('d', islice(source, len(buffer)))
+
+
+class Timing:
+    """Think, eat or reach time of a simulation, with a stream of its own for every philosopher
+
+    Simulation asks stream(i) for the durations of philosopher i, so the philosophers neither
+    share a generator nor depend on the order the threads run in: with a seed, every philosopher
+    gets the same durations on every run. stream tells apart the timings sharing a seed.
+    """
+
+    def __init__(self, distribution, seed=None, stream=0, batch_size=BATCH_SIZE):
+        self.distribution = distribution
+        self.seed = seed
+        self.key = seed_key(seed)
+        self.stream_index = stream
+        self.batch_size = batch_size
+
+    def stream(self, philosopher):
+        """Callable returning the next duration of philosopher i"""
+        # chain walks the buffer in C, the generator only runs once per batch to refill it
+        return chain.from_iterable(self.batches(philosopher)).__next__
+
+    def batches(self, philosopher):
+        """The same buffer over and over, filled again whenever the previous durations were all drawn"""
+        # Nothing is allocated before the first draw, so a large table costs nothing until it starts
+        source = self.distribution.source(self.key, self.stream_index, philosopher)
+        buffer = array('d', [0.0]) * self.batch_size
+        while True:
+            # NumPy fills the array in place through a view, made for the refill only as it weighs twice
+            # a small buffer, and the durations are read from the array as floats
+            self.distribution.fill(buffer if numpy is None else numpy.frombuffer(buffer), source)
+            yield buffer
+
+
+def timings(think, eat, reach, seed=None, batch_size=BATCH_SIZE):
+    """Keyword arguments of a simulation timing its steps with the distributions, on independent streams"""
+    return {name: Timing(distribution, seed, stream, batch_size)
+            for stream, (name, distribution) in enumerate((("think_time", think), ("eat_time", eat),
+                                                            ("reach_time", reach)))}
+
+
+def recorded_distributions(reader):
+    """Think, eat and reach Replay distributions of the durations in a trace, per philosopher
+
+    Thinking lasts from THINK to HUNGRY, eating from EAT to the BITE and reaching from taking
+    the first chopstick to the next attempt on the second one. Meals cut by a stop are left out,
+    philosophers that never went through a step replay the durations of everyone, and a step
+    nobody went through takes no time.
+    """
+    n = reader.number_of_philosophers
+    durations = [[[] for _ in range(n)] for _ in range(3)]
+    since = [[None] * n for _ in range(3)]
+    held = [0] * n
+    think, eat, reach = range(3)
+    for timestamp, event, philosopher, chopstick in reader.records():
+        if since[reach][philosopher] is not None and event in (Event.WAIT, Event.ACQUIRE, Event.ACQUIRE_FAILED):
+            durations[reach][philosopher].append((timestamp - since[reach][philosopher]) / 1e9)
+            since[reach][philosopher] = None
+        if event == Event.THINK:
+            since[think][philosopher] = timestamp
+        elif event == Event.HUNGRY and since[think][philosopher] is not None:
+            durations[think][philosopher].append((timestamp - since[think][philosopher]) / 1e9)
+            since[think][philosopher] = None
+        elif event == Event.EAT:
+            since[eat][philosopher] = timestamp
+        elif event == Event.BITE and since[eat][philosopher] is not None:
+            durations[eat][philosopher].append((timestamp - since[eat][philosopher]) / 1e9)
+            since[eat][philosopher] = None
+        elif event == Event.ACQUIRE:
+            held[philosopher] += 1
+            if held[philosopher] == 1:
+                since[reach][philosopher] = timestamp
+        elif event == Event.RELEASE:
+            held[philosopher] -= 1
+            since[eat][philosopher] = since[reach][philosopher] = None
+    distributions = []
+    for step in durations:
+        everyone = [duration for philosopher in step for duration in philosopher]
+        distributions.append(Replay([philosopher or everyone for philosopher in step]) if everyone else Fixed(0.0))
+    return distributions
+
+
+def load_distributions(path):
+    """recorded_distributions of the trace at path"""
+    reader = TraceReader(path)
+    try:
+        return recorded_distributions(reader)
+    finally:
+        reader.close()
+
+
+def main():
+    import argparse
+    import timeit
+    parser = argparse.ArgumentParser(description="Measures the cost of drawing a duration")
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    arguments = parser.parse_args()
+    print(f"{'random.random':<14}{timeit.timeit(random.random, number=arguments.draws) / arguments.draws * 1e9:8.1f} ns")
+    for distribution in (Fixed(0.01), Uniform(0, 0.01), Exponential(0.01), LogNormal(0.01, 0.5)):
+        stream = Timing(distribution, seed=0).stream(0)
+        cost = timeit.timeit(stream, number=arguments.draws) / arguments.draws
+        print(f"{type(distribution).__name__:<14}{cost * 1e9:8.1f} ns")
+    print("numpy" if numpy is not None else "random fallback, numpy is not installed")
+
+
+if __name__ == "__main__":
+    main()
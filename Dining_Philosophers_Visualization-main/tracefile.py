@@ -0,0 +1,274 @@
+from array import array
+from collections import deque
+from threading import Event as Flag, Lock, Thread
+import mmap
+import os
+import struct
+import time
+from simulation import Event
+from state import FREE
+
+# Magic, format version, number of philosophers and meal size
+HEADER = struct.Struct("<8sIII")
+MAGIC = b"DPTRACE\0"
+VERSION = 1
+# Nanoseconds since the start of the trace, event, philosopher and chopstick (FREE when none)
+RECORD = struct.Struct("<qB3xii")
+# Records between two tables kept by TraceReader.table_at
+KEYFRAME_INTERVAL = 1 << 16
+
+
+class TraceWriter:
+    """Observer appending every event to a binary trace of fixed-width records
+
+    Observers only append a tuple to a deque, a background thread packs the pending events and
+    writes them every flush_interval seconds. close() writes the last ones. The clock is read under
+    the lock of the append, so the records stay in timestamp order for TraceReader.index_at.
+    clock returns nanoseconds, the monotonic clock by default; a DiscreteEventSimulation can pass
+    its virtual clock so the trace keeps the virtual times.
+    """
+
+    def __init__(self, path, number_of_philosophers, meal_size, flush_interval=0.1, clock=time.monotonic_ns):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, number_of_philosophers, meal_size))
+        self.clock = clock
+        self.started = clock()
+        self.pending = deque()
+        self.lock = Lock()
+        self.flush_interval = flush_interval
+        self.closing = Flag()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __call__(self, event, philosopher, chopstick):
+        chopstick = FREE if chopstick is None else chopstick
+        with self.lock:
+            self.pending.append((self.clock() - self.started, event, philosopher, chopstick))
+
+    def flush(self):
+        pending = self.pending
+        count = len(pending)
+        if not count:
+            return
+        buffer = bytearray(count * RECORD.size)
+        for offset in range(0, len(buffer), RECORD.size):
+            RECORD.pack_into(buffer, offset, *pending.popleft())
+        self.file.write(buffer)
+
+    def run(self):
+        while not self.closing.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self.closing.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+
+def game_path(path, game):
+    """Trace path of the game-th game recorded to path, trace.dpt then trace-2.dpt, trace-3.dpt..."""
+    if game <= 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{game}{extension}"
+
+
+class TraceReader:
+    """Memory-mapped trace, records are decoded one at a time when they are read
+
+    A record being written when the trace was opened is ignored.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as trace:
+            self.map = mmap.mmap(trace.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.number_of_philosophers, self.meal_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} trace")
+        self.count = (len(self.map) - HEADER.size) // RECORD.size
+        n = self.number_of_philosophers
+        self.keyframes = [(array('i', [FREE]) * n, array('i', [self.meal_size]) * n)]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """(nanoseconds, event, philosopher, chopstick) of the record"""
+        if not 0 <= index < self.count:
+            raise IndexError("trace record out of range")
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def timestamp(self, index):
+        return struct.unpack_from("<q", self.map, HEADER.size + index * RECORD.size)[0]
+
+    @property
+    def duration(self):
+        return self.timestamp(self.count - 1) if self.count else 0
+
+    def index_at(self, timestamp):
+        """Index of the first record at or after timestamp, binary search over the map"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=0, stop=None):
+        """Iterates over the records from start to stop"""
+        stop = self.count if stop is None else min(stop, self.count)
+        view = memoryview(self.map)[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def table_at(self, index):
+        """Chopstick holders and meals left just before the record at index
+
+        The table is kept every KEYFRAME_INTERVAL records the first time it is computed, so a seek
+        only replays the records since the previous keyframe.
+        """
+        keyframe = min(index // KEYFRAME_INTERVAL, len(self.keyframes) - 1)
+        holders, meals = (list(table) for table in self.keyframes[keyframe])
+        start = keyframe * KEYFRAME_INTERVAL
+        while start < index:
+            stop = min(index, start + KEYFRAME_INTERVAL - start % KEYFRAME_INTERVAL)
+            for _, event, philosopher, chopstick in self.records(start, stop):
+                if event == Event.ACQUIRE:
+                    holders[chopstick] = philosopher
+                elif event == Event.RELEASE:
+                    holders[chopstick] = FREE
+                elif event == Event.BITE:
+                    meals[philosopher] -= 1
+            start = stop
+            if start % KEYFRAME_INTERVAL == 0 and start // KEYFRAME_INTERVAL == len(self.keyframes):
+                self.keyframes.append((array('i', holders), array('i', meals)))
+        return holders, meals
+
+    def close(self):
+        self.map.close()
+
+
+class TraceReplay:
+    """Plays a trace back to observers in real time, speed times faster, and can jump anywhere in it
+
+    It has the start/join/stop/add_observer interface of Simulation. After a seek, observers with
+    a restore(holders, meals) method get the table at the new position before the events resume.
+    """
+
+    def __init__(self, reader, speed=1.0):
+        self.reader = reader
+        self.speed = speed
+        self.observers = []
+        self.thread = None
+        self.stopping = Flag()
+        self.wake = Flag()
+        self.seek_to = None
+        # Timestamp of the last event played
+        self.position = 0
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def seek(self, timestamp):
+        """Continues the replay from timestamp, in nanoseconds since the start of the trace"""
+        self.seek_to = max(0, min(timestamp, self.reader.duration))
+        self.wake.set()
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.wake.set()
+
+    def play(self):
+        reader = self.reader
+        index = 0
+        base_timestamp, base_time, speed = 0, time.monotonic(), self.speed
+        while not self.stopping.is_set():
+            if self.seek_to is not None:
+                base_timestamp, self.seek_to = self.seek_to, None
+                index = reader.index_at(base_timestamp)
+                self.position = base_timestamp
+                holders, meals = reader.table_at(index)
+                for observer in self.observers:
+                    restore = getattr(observer, "restore", None)
+                    if restore is not None:
+                        restore(holders, meals)
+                base_time = time.monotonic()
+            if speed != self.speed:
+                # Rebase on the current position of the replay
+                base_timestamp += (time.monotonic() - base_time) * speed * 1e9
+                base_time, speed = time.monotonic(), self.speed
+            self.wake.clear()
+            if index >= len(reader):
+                # At the end, wait for a seek or a stop
+                self.wake.wait(0.1)
+                continue
+            timestamp, event, philosopher, chopstick = reader[index]
+            delay = base_time + (timestamp - base_timestamp) / 1e9 / speed - time.monotonic()
+            if delay > 0 and self.wake.wait(delay):
+                continue
+            for observer in self.observers:
+                observer(Event(event), philosopher, None if chopstick == FREE else chopstick)
+            self.position = timestamp
+            index += 1
+
+    def start(self):
+        self.thread = Thread(target=self.play, daemon=True)
+        self.thread.start()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+
+    def alive_threads(self):
+        return int(self.thread is not None and self.thread.is_alive())
+
+
+def main():
+    import argparse
+    from collections import Counter
+    from discrete_event import DiscreteEventSimulation
+    from strategies import STRATEGIES, create
+    parser = argparse.ArgumentParser(description="Records and inspects binary traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="run a simulation and write its trace")
+    record.add_argument("path")
+    record.add_argument("-n", "--philosophers", type=int, default=5)
+    record.add_argument("-m", "--meals", type=int, default=10)
+    record.add_argument("--strategy", default="check_locked", choices=list(STRATEGIES))
+    record.add_argument("--seed", type=int, default=None,
+                        help="run a discrete-event simulation with this seed instead, on its virtual clock")
+    info = commands.add_parser("info", help="summarize a trace")
+    info.add_argument("path")
+    arguments = parser.parse_args()
+
+    if arguments.command == "record":
+        n, m = arguments.philosophers, arguments.meals
+        if arguments.seed is None:
+            simulation = create(arguments.strategy, n, m)
+            writer = TraceWriter(arguments.path, n, m)
+        else:
+            simulation = DiscreteEventSimulation(n, m, seed=arguments.seed)
+            writer = TraceWriter(arguments.path, n, m, clock=lambda: int(simulation.now * 1e9))
+        simulation.add_observer(writer)
+        simulation.run()
+        writer.close()
+
+    reader = TraceReader(arguments.path)
+    events = Counter(Event(record[1]).name for record in reader.records())
+    print(f"{reader.number_of_philosophers} philosophers, meals of {reader.meal_size}, {len(reader)} events "
+          f"over {reader.duration / 1e9:.3f}s")
+    print("  ".join(f"{name} {count}" for name, count in events.most_common()))
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,24 @@
-from threading import Thread, Lock
-import random
-import time
+from detector import Detector
+from instrumentation import Instrumentation
+from monitor import ConsoleMonitor
+from simulation import Simulation
 
 
-class DiningPhilosophers:
-    def __init__(self, number_of_philosophers, meal_size=9):
-        self.meals = [meal_size for _ in range(number_of_philosophers)]
-        self.chopsticks = [Lock() for _ in range(number_of_philosophers)]
-        self.status = ['  T  ' for _ in range(number_of_philosophers)]
-        self.chopstick_holders = ['     ' for _ in range(number_of_philosophers)]
-        self.number_of_philosophers = number_of_philosophers
-
-    def philosopher(self, i):
-        j = (i+1) % self.number_of_philosophers
-        while self.meals[i] > 0:
-            self.status[i] = '  T  '
-            time.sleep(random.random())
-            self.status[i] = '  _  '
-            if not self.chopsticks[i].locked():
-                self.chopsticks[i].acquire()
-                self.chopstick_holders[i] = ' /   '
-                time.sleep(random.random())
-                if not self.chopsticks[j].locked():
-                    self.chopsticks[j].acquire()
-                    self.chopstick_holders[i] = ' / \\ '
-                    self.status[i] = '  E  '
-                    time.sleep(random.random())
-                    self.meals[i] -= 1
-                    self.chopsticks[j].release()
-                    self.chopstick_holders[i] = '     '
-                    self.chopsticks[i].release()
-                    self.chopstick_holders[i] = '     '
-                    self.status[i] = '  T  '
-                else:
-                    self.chopsticks[i].release()
-                    self.chopstick_holders[i] = '     '
+class DiningPhilosophers(Simulation):
+    """Takes a chopstick only if it is not locked, backs off when the second one is taken"""
 
 
 def main():
     n = 10
     m = 7
     dining_philosophers = DiningPhilosophers(n, m)
-    philosophers = [Thread(target=dining_philosophers.philosopher, args=(i,)) for i in range(n)]
-    for philosopher in philosophers:
-        philosopher.start()
-    while sum(dining_philosophers.meals) > 0:
-        print("=" * (n*5))
-        print("".join(map(str, dining_philosophers.status)), " : ",
-              str(dining_philosophers.status.count('  E  ')))
-        print("".join(map(str, dining_philosophers.chopstick_holders)))
-        print("".join("{:3d}  ".format(m) for m in dining_philosophers.meals), " : ",
-              str(sum(dining_philosophers.meals)))
-        time.sleep(0.1)
-    for philosopher in philosophers:
-        philosopher.join()
+    instrumentation = Instrumentation(n)
+    dining_philosophers.add_observer(instrumentation)
+    dining_philosophers.add_observer(Detector(n))
+    monitor = ConsoleMonitor(dining_philosophers, instrumentation)
+    dining_philosophers.start()
+    monitor.run()
+    dining_philosophers.join()
 
 
 if __name__ == "__main__":